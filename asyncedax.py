@@ -0,0 +1,231 @@
+import asyncio
+import inspect
+import sys
+import time
+
+from utils import LibC
+from gamerecord import NO_OPENING
+from maingame import game_plies
+from openings import opening_game, seats, unseat
+from players.edax_player import coordToMove
+from players.edax_player_solve import bitboards_to_obf
+from tournament import REPORT_INTERVAL, TournamentResult
+
+'''
+    Asyncio orchestration of many mEdax processes from one Python process. Engines are driven through non-blocking
+    pipes, so while one engine thinks the event loop feeds the others; CPU goes to the engines, not to one Python
+    process per game.
+    Engines are stateless between requests: every move request sends the position (setboard) and `go`, so any engine
+    of a pool can serve any game. A game waiting for a move borrows an idle engine of its player's EnginePool.
+'''
+
+EDAX_BIN = "./bin/mEdax"
+MOVE_TIMEOUT = 300.0 # seconds an engine may think before it is killed and restarted
+CLOSE_TIMEOUT = 5.0
+
+class EngineError(Exception):
+    pass
+
+class AsyncEdaxEngine:
+
+    '''
+        One mEdax process in console mode 3 (edax never plays on its own).
+        options - mEdax options, eg. ['-l', '10']
+    '''
+    def __init__(self, options=(), binary=EDAX_BIN):
+        self.options = list(options)
+        self.binary = binary
+        self.process = None
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(self.binary, '-mode', '3', *self.options,
+                                                            stdin=asyncio.subprocess.PIPE,
+                                                            stdout=asyncio.subprocess.PIPE,
+                                                            stderr=asyncio.subprocess.STDOUT)
+        return self
+
+    async def _read_move(self):
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                raise EngineError("mEdax exited (code {})".format(self.process.returncode))
+            line = line.decode('utf-8', 'replace')
+            if line.startswith("Edax plays"):
+                return coordToMove(line.split()[2])
+
+    async def get_move(self, board, timeout=MOVE_TIMEOUT):
+        """
+            :param board: Board / Position, side to move as player
+            :return: move 0..63, -1 for a pass
+        """
+        if not self.alive:
+            raise EngineError("engine is not running")
+        self.process.stdin.write("setboard {}\ngo\n".format(bitboards_to_obf(board.player, board.opponent)).encode())
+        await self.process.stdin.drain()
+        try:
+            return await asyncio.wait_for(self._read_move(), timeout)
+        except asyncio.TimeoutError:
+            # a late answer would be read as the reply to the next request
+            await self.kill()
+            raise
+
+    async def kill(self):
+        if self.alive:
+            self.process.kill()
+            await self.process.wait()
+
+    async def close(self):
+        if not self.alive:
+            return
+        try:
+            self.process.stdin.write(b"quit\n")
+            await self.process.stdin.drain()
+            await asyncio.wait_for(self.process.wait(), CLOSE_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError):
+            await self.kill()
+
+class EnginePool:
+
+    '''
+        n_engines engines with the same options, shared by every game of a player.
+        Engines that crash or time out are replaced before they go back to the pool, an engine that cannot be restarted
+        leaves it. Once none is left every request fails with EngineError.
+    '''
+    def __init__(self, n_engines, options=(), binary=EDAX_BIN, timeout=MOVE_TIMEOUT):
+        self.engines = [AsyncEdaxEngine(options, binary) for _ in range(n_engines)]
+        self.timeout = timeout
+        self.idle = None
+        self.restarts = 0
+
+    async def start(self):
+        self.idle = asyncio.Queue()
+        for engine in await asyncio.gather(*(e.start() for e in self.engines)):
+            self.idle.put_nowait(engine)
+        return self
+
+    async def get_move(self, board):
+        engine = await self.idle.get()
+        if engine is None:
+            # every engine is gone, wake the next waiting game too
+            self.idle.put_nowait(None)
+            raise EngineError("no mEdax left in the pool")
+        requeue = True
+        try:
+            return await engine.get_move(board, self.timeout)
+        except (EngineError, asyncio.TimeoutError, ConnectionError) as e:
+            self.restarts += 1
+            try:
+                await engine.kill()
+                await engine.start()
+            except OSError as restart_error:
+                # eg. the binary is gone: the engine leaves the pool instead of failing every game it would serve
+                requeue = False
+                self.engines.remove(engine)
+                if not self.engines:
+                    self.idle.put_nowait(None)
+                raise EngineError("cannot restart mEdax: {!r}".format(restart_error)) from e
+            if isinstance(e, ConnectionError):
+                # the pipe of a crashed engine, reported like its other failures
+                raise EngineError("lost mEdax: {!r}".format(e)) from e
+            raise
+        finally:
+            if requeue:
+                self.idle.put_nowait(engine)
+
+    async def close(self):
+        await asyncio.gather(*(e.close() for e in self.engines))
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+class AsyncEdaxPlayer:
+
+    '''
+        Player backed by an EnginePool, for play_async.
+    '''
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+
+    def new_game(self, board=None):
+        pass
+
+    async def get_move(self, board, moves=None):
+        return await self.pool.get_move(board)
+
+async def play_async(players, libc=None, observers=(), start=None, opening=NO_OPENING, clocks=None):
+    """
+        maingame.play for players whose get_move may be a coroutine (AsyncEdaxPlayer), others are called directly.
+        :return: (disc counts per player, winner) winner is 0, 1 or 2 for a draw
+    """
+    is_async = [inspect.iscoroutinefunction(p.get_move) for p in players]
+    game = game_plies(players, libc, observers, start, opening, clocks)
+    try:
+        current_player, board, moves = next(game)
+        while True:
+            if moves == 0:
+                # forced pass, no need to ask (or wait for) an engine
+                move = -1
+            elif is_async[current_player]:
+                move = await players[current_player].get_move(board, moves=moves)
+            else:
+                move = players[current_player].get_move(board, moves=moves)
+            current_player, board, moves = game.send(move)
+    except StopIteration as end:
+        return end.value
+
+async def run_match(players, total_games, max_games=None, openings=None, make_observers=None, verbose=True):
+    """
+        Play total_games games concurrently in this process, at most max_games at a time.
+        :param players: two player objects (eg. AsyncEdaxPlayer on their pools), shared by all games
+        :param max_games: concurrent games, keep it above the total number of engines so none stays idle
+        :param openings: BoardArray opening suite, game i plays opening i // 2 with colors swapped on odd i
+        :param make_observers: game_id -> observers of that game (observers.py). Games run interleaved, so observers
+                               keeping the state of a game (RecordObserver, GameMetrics) cannot be shared between
+                               them, eg. lambda game_id: [RecordObserver(writer)] with one writer for all games
+        :param verbose: print progress every REPORT_INTERVAL seconds
+        :return: tournament.TournamentResult
+    """
+    libc = LibC()
+    result = TournamentResult([p.name for p in players], paired=openings is not None)
+    limit = asyncio.Semaphore(max_games or total_games)
+    last_report = [time.time()]
+
+    async def game(game_id):
+        async with limit:
+            observers = make_observers(game_id) if make_observers is not None else ()
+            try:
+                if openings is None:
+                    cnts, winner = await play_async(players, libc, observers)
+                else:
+                    opening, swapped = opening_game(game_id)
+                    cnts, winner = unseat(*await play_async(seats(players, swapped), libc, observers,
+                                                            openings[opening], opening), swapped)
+                result.add(game_id, winner, cnts)
+            except (EngineError, asyncio.TimeoutError) as e:
+                result.add(game_id, None, repr(e))
+            if verbose and time.time() - last_report[0] >= REPORT_INTERVAL:
+                last_report[0] = time.time()
+                print(result.progress(total_games), file=sys.stderr)
+
+    await asyncio.gather(*(game(i) for i in range(total_games)))
+    result.end = time.time()
+    return result
+
+async def _main(total_games, n_engines, levels):
+    pools = [EnginePool(n_engines, ['-l', str(level)]) for level in levels]
+    async with pools[0], pools[1]:
+        players = [AsyncEdaxPlayer("edax l{}".format(level), pool) for level, pool in zip(levels, pools)]
+        result = await run_match(players, total_games, max_games=4 * n_engines)
+    print(result.summary())
+
+if __name__ == '__main__':
+    # usage: python asyncedax.py total_games engines_per_player level_0 level_1
+    asyncio.run(_main(int(sys.argv[1]), int(sys.argv[2]), (int(sys.argv[3]), int(sys.argv[4]))))
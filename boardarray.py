@@ -0,0 +1,171 @@
+import ctypes
+import numpy as np
+
+from clib import BOARD_DTYPE, Board, get_lib
+from position import Position
+
+'''
+    BoardArray - many positions in one contiguous BOARD_DTYPE array, the bulk counterpart of position.Position.
+    The layout is exactly a C `Board[n]`, so an array (including one memory-mapped from a .npy file) reaches edax.so as a
+    raw pointer with no copy. Datasets are converted from OBF text once (from_obf/load_obf) and saved as .npy, after
+    which loading a multi-GB file is an mmap instead of a parse.
+'''
+
+BIT_WEIGHTS = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+
+def bit_count(a):
+    # vectorized popcount of a uint64 array
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(a).astype(np.uint8)
+    return np.unpackbits(np.ascontiguousarray(a, dtype="<u8").view(np.uint8).reshape(-1, 8), axis=1).sum(
+        axis=1, dtype=np.uint8)
+
+def bits_to_squares(bits):
+    # (n, 64) bool/uint8 squares, A1 first -> uint64 bitboards
+    packed = np.packbits(np.ascontiguousarray(bits, dtype=np.uint8).reshape(-1, 64), axis=1, bitorder="little")
+    return packed.view("<u8").reshape(-1)
+
+def squares_to_bits(a):
+    # uint64 bitboards -> (n, 64) uint8 squares, A1 first
+    a = np.ascontiguousarray(a, dtype="<u8")
+    return np.unpackbits(a.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+
+class BoardArray:
+
+    '''
+        data - 1-d BOARD_DTYPE array, kept as is (a slice or an np.memmap stays a view)
+    '''
+    def __init__(self, data):
+        data = np.asarray(data)
+        if data.dtype != BOARD_DTYPE or data.ndim != 1:
+            raise ValueError("BoardArray needs a 1-d array of dtype {}, got {} {}".format(BOARD_DTYPE, data.ndim,
+                                                                                          data.dtype))
+        self.data = data
+
+    @classmethod
+    def empty(cls, n):
+        return cls(np.zeros(n, dtype=BOARD_DTYPE))
+
+    @classmethod
+    def from_bitboards(cls, player, opponent):
+        data = np.empty(len(player), dtype=BOARD_DTYPE)
+        data["player"] = player
+        data["opponent"] = opponent
+        return cls(data)
+
+    @classmethod
+    def from_positions(cls, positions):
+        # any iterable of Position / Board / (player, opponent)
+        return cls(np.array([(b[0], b[1]) if isinstance(b, tuple) else (b.player, b.opponent) for b in positions],
+                            dtype=BOARD_DTYPE).reshape(-1))
+
+    @classmethod
+    def from_obf(cls, lines):
+        """
+            Parse OBF entries ("<64 squares> <side to move>;"), side to move becomes player.
+            :param lines: iterable of str or bytes, blank lines are skipped
+        """
+        rows = [l.encode() if isinstance(l, str) else l for l in lines]
+        rows = [l[:66] for l in rows if len(l.strip()) > 0]
+        if len(rows) == 0:
+            return cls.empty(0)
+        chars = np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(-1, 66)
+        squares, side = chars[:, :64], chars[:, 65:66]
+        if not np.all((side == ord("X")) | (side == ord("O"))):
+            raise ValueError("malformed obf entry: side to move must be X or O")
+        player = squares == side
+        opponent = (squares != side) & (squares != ord("-"))
+        return cls.from_bitboards(bits_to_squares(player), bits_to_squares(opponent))
+
+    @classmethod
+    def load_obf(cls, filename):
+        with open(filename, "rb") as f:
+            return cls.from_obf(f.read().splitlines())
+
+    @classmethod
+    def load(cls, filename, mmap=True):
+        # mmap: read-only view of the file, pages are loaded on access
+        return cls(np.load(filename, mmap_mode="r" if mmap else None))
+
+    @classmethod
+    def concatenate(cls, arrays):
+        return cls(np.concatenate([a.data if isinstance(a, BoardArray) else a for a in arrays]))
+
+    def save(self, filename):
+        np.save(filename, self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        # int -> Position, slice / mask / index array -> BoardArray
+        item = self.data[index]
+        if isinstance(item, np.void):
+            return Position(int(item["player"]), int(item["opponent"]))
+        return BoardArray(item)
+
+    def __iter__(self):
+        for player, opponent in zip(self.data["player"].tolist(), self.data["opponent"].tolist()):
+            yield Position(player, opponent)
+
+    def __repr__(self):
+        return "BoardArray({} positions)".format(len(self.data))
+
+    @property
+    def player(self):
+        return self.data["player"]
+
+    @property
+    def opponent(self):
+        return self.data["opponent"]
+
+    @property
+    def ptr(self):
+        # Board* to the first position, valid as long as this array is alive. A strided array has no such pointer:
+        # call contiguous() and keep the result alive while C uses it
+        if not self.data.flags["C_CONTIGUOUS"]:
+            raise ValueError("BoardArray.ptr needs contiguous data, use contiguous().ptr on a kept reference")
+        return ctypes.cast(self.data.ctypes.data, ctypes.POINTER(Board))
+
+    def contiguous(self):
+        # a strided slice (eg. a[::2]) has to be compacted before it can be passed to C
+        if self.data.flags["C_CONTIGUOUS"]:
+            return self
+        return BoardArray(np.ascontiguousarray(self.data))
+
+    def copy(self):
+        return BoardArray(self.data.copy())
+
+    def empties(self):
+        return (64 - bit_count(self.data["player"] | self.data["opponent"])).astype(np.uint8)
+
+    def with_empties(self, lo, hi=None):
+        # positions with lo <= empties <= hi (hi defaults to lo)
+        e = self.empties()
+        return self[(e >= lo) & (e <= (lo if hi is None else hi))]
+
+    def moves(self):
+        # legal move masks for the side to move
+        data = self.contiguous().data
+        out = np.empty(len(data), dtype=np.uint64)
+        get_lib().get_moves_boards(data, out, len(data))
+        return out
+
+    def to_obf(self, player_is_black=True):
+        # list of OBF entries, inverse of from_obf
+        player, opponent = squares_to_bits(self.data["player"]), squares_to_bits(self.data["opponent"])
+        me, other = (b"X", b"O") if player_is_black else (b"O", b"X")
+        chars = np.full(player.shape, ord("-"), dtype=np.uint8)
+        chars[player == 1] = me[0]
+        chars[opponent == 1] = other[0]
+        suffix = b" " + me + b";"
+        return [row.tobytes().decode() + suffix.decode() for row in chars]
+
+    def to_grid(self, player_value=1, opponent_value=-1):
+        """
+            (n, 8, 8) int8 boards, row 1 first, in the style of OthelloEnv.game_board.
+            Default values follow the side to move: player 1, opponent -1.
+        """
+        grid = (squares_to_bits(self.data["player"]).astype(np.int8) * player_value
+                + squares_to_bits(self.data["opponent"]).astype(np.int8) * opponent_value)
+        return grid.reshape(-1, 8, 8)
@@ -0,0 +1,113 @@
+import json
+import os
+import time
+import numpy as np
+
+'''
+    Checkpoints of long runs, so an interrupted run resumes instead of starting over.
+    Checkpoint - append-only journal of finished work (one JSON value per line), eg. the results of finished games. A
+                 flush is one O_APPEND write plus fsync, so a crash leaves at most a torn last line, which load skips.
+                 A resumed run loads the journal, skips what it lists and keeps appending to the same file, cut back to
+                 its last complete line first so no entry is glued to a torn one.
+    save_shard - a finished shard of a dataset (eg. solved positions) written to a temporary name and renamed into
+                 place: the shard file exists only once it is complete, its existence is the checkpoint.
+'''
+
+CHECKPOINT_INTERVAL = 10.0 # seconds between journal flushes
+TAIL_BLOCK = 65536 # bytes read at a time when looking for the end of the last complete line
+
+class Checkpoint:
+
+    '''
+        filename - journal file, appended to (created if missing) after a torn last line is cut off
+        interval - seconds between automatic flushes in add, 0 flushes every entry
+    '''
+    def __init__(self, filename, interval=CHECKPOINT_INTERVAL):
+        self.filename = filename
+        self.interval = interval
+        self.fd = os.open(filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        size = Checkpoint.complete_size(filename)
+        if os.fstat(self.fd).st_size > size:
+            os.ftruncate(self.fd, size)
+        self.buffer = []
+        self.last_flush = time.time()
+
+    @staticmethod
+    def complete_size(filename):
+        # bytes of the journal up to the end of its last complete line, what load reads
+        with open(filename, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            while end > 0:
+                start = max(end - TAIL_BLOCK, 0)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    return start + newline + 1
+                end = start
+        return 0
+
+    @staticmethod
+    def load(filename):
+        # entries of a journal, [] if it does not exist
+        if not os.path.exists(filename):
+            return []
+        entries = []
+        with open(filename, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break # torn last write
+                entries.append(json.loads(line))
+        return entries
+
+    def due(self):
+        # the next add flushes
+        return time.time() - self.last_flush >= self.interval
+
+    def add(self, entry):
+        self.buffer.append(json.dumps(entry, separators=(",", ":")) + "\n")
+        if self.due():
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            data = "".join(self.buffer).encode("utf-8")
+            written = os.write(self.fd, data)
+            if written != len(data):
+                raise OSError("short write to {}: {}/{} bytes".format(self.filename, written, len(data)))
+            os.fsync(self.fd)
+            self.buffer = []
+        self.last_flush = time.time()
+
+    def close(self):
+        if self.fd is not None:
+            self.flush()
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def shard_path(directory, index):
+    return os.path.join(directory, "shard_{:05d}.npy".format(index))
+
+def save_shard(directory, index, array):
+    """
+        Write shard index of a dataset atomically.
+        :return: path of the shard
+    """
+    path = shard_path(directory, index)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+def load_shards(directory, n_shards, mmap=True):
+    # shards 0..n_shards-1 concatenated, raises if one is missing (the run is not finished)
+    return np.concatenate([np.load(shard_path(directory, i), mmap_mode="r" if mmap else None)
+                           for i in range(n_shards)])
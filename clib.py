@@ -0,0 +1,213 @@
+import ctypes
+from ctypes import cdll
+import os
+import threading
+import numpy as np
+
+'''
+    Process-wide handle to the edax shared library.
+    The library is loaded lazily on first use and every prototype is declared exactly once, so constructing a LibC
+    (one per player per game) no longer costs a dlopen plus a dozen argtypes assignments.
+    Library path: $EDAX_SO if set, otherwise edax_so/edax.so next to this file.
+'''
+
+EDAX_SO_ENV = "EDAX_SO"
+DEFAULT_SO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "edax_so", "edax.so")
+
+class Board(ctypes.Structure):
+    _fields_=[("player", ctypes.c_uint64), ("opponent", ctypes.c_uint64)]
+    def __init__(self, player, opponent):
+        self.player = player
+        self.opponent = opponent
+
+    def __eq__(self, other):
+        return self.opponent == other.opponent and self.player == other.player
+
+# mirrors TurnState in edax_src/pyutils.h
+class TurnState(ctypes.Structure):
+    _fields_=[("moves", ctypes.c_uint64), ("opponent_moves", ctypes.c_uint64), ("player_count", ctypes.c_int),
+              ("opponent_count", ctypes.c_int), ("pass_", ctypes.c_int), ("game_over", ctypes.c_int)]
+
+# numpy layout of an array of Board, see boardarray.py
+BOARD_DTYPE = np.dtype([("player", "<u8"), ("opponent", "<u8")])
+
+# mirrors SearchOutput in edax_src/pyutils.h
+GAME_SIZE = 80
+class SearchOutput(ctypes.Structure):
+    _fields_=[("move", ctypes.c_int), ("score", ctypes.c_int), ("lower", ctypes.c_int), ("upper", ctypes.c_int),
+              ("depth", ctypes.c_int), ("selectivity", ctypes.c_int), ("accuracy", ctypes.c_int),
+              ("n_empties", ctypes.c_int), ("n_nodes", ctypes.c_ulonglong), ("time", ctypes.c_longlong),
+              ("pv_length", ctypes.c_int), ("pv", ctypes.c_int * GAME_SIZE)]
+
+# contiguous NumPy buffers for the *_batch entry points
+U64_ARRAY = np.ctypeslib.ndpointer(dtype=np.uint64, flags="C_CONTIGUOUS")
+I32_ARRAY = np.ctypeslib.ndpointer(dtype=np.int32, flags="C_CONTIGUOUS")
+U8_ARRAY = np.ctypeslib.ndpointer(dtype=np.uint8, flags="C_CONTIGUOUS")
+BOARD_ARRAY = np.ctypeslib.ndpointer(dtype=BOARD_DTYPE, flags="C_CONTIGUOUS")
+
+# name -> (argtypes, restype). If restype not explicitly set, cdll will truncate a returning int64 to int8
+PROTOTYPES = {
+    "get_moves": ([ctypes.c_ulonglong, ctypes.c_ulonglong], ctypes.c_ulonglong),
+    "get_stderr": ([], ctypes.c_int64),
+    "get_stdout": ([], ctypes.c_int64),
+    "get_stdin": ([], ctypes.c_int64),
+    #ctypes.POINTER(Board) alias ctypes.c_int64
+    "board_print": ([ctypes.POINTER(Board), ctypes.c_int16, ctypes.c_int64], None),
+    "board_init": ([ctypes.POINTER(Board)], None),
+    "board_is_game_over": ([ctypes.POINTER(Board)], ctypes.c_bool),
+    "board_swap_players": ([ctypes.POINTER(Board)], None),
+    "board_next": ([ctypes.POINTER(Board), ctypes.c_int16, ctypes.POINTER(Board)], ctypes.c_ulonglong),
+    "bit_count": ([ctypes.c_ulonglong], ctypes.c_int8),
+    "get_moves_batch": ([U64_ARRAY, U64_ARRAY, U64_ARRAY, ctypes.c_longlong], None),
+    "board_turn_state": ([ctypes.POINTER(Board), ctypes.POINTER(TurnState)], None),
+    "get_moves_boards": ([BOARD_ARRAY, U64_ARRAY, ctypes.c_longlong], None),
+    "board_next_batch": ([U64_ARRAY, U64_ARRAY, I32_ARRAY, U64_ARRAY, U64_ARRAY, ctypes.c_longlong], None),
+    "disc_count_batch": ([U64_ARRAY, U64_ARRAY, U8_ARRAY, U8_ARRAY, ctypes.c_longlong], None),
+    "game_over_batch": ([U64_ARRAY, U64_ARRAY, U8_ARRAY, ctypes.c_longlong], None),
+    "count_moves": ([ctypes.POINTER(Board), ctypes.c_int], ctypes.c_ulonglong),
+    # Search* is kept opaque on the python side
+    "edax_global_init": ([ctypes.c_char_p], None),
+    "pyengine_new": ([ctypes.c_int, ctypes.c_int], ctypes.c_void_p),
+    "pyengine_free": ([ctypes.c_void_p], None),
+    "pyengine_clear": ([ctypes.c_void_p], None),
+    "pyengine_search": ([ctypes.c_void_p, ctypes.POINTER(Board), ctypes.c_int, ctypes.c_longlong,
+                        ctypes.POINTER(SearchOutput)], None),
+    "solve_batch": ([U64_ARRAY, U64_ARRAY, ctypes.c_longlong, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                     I32_ARRAY, I32_ARRAY, I32_ARRAY], ctypes.c_int),
+    "solve_boards": ([BOARD_ARRAY, ctypes.c_longlong, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                      I32_ARRAY, I32_ARRAY, I32_ARRAY], ctypes.c_int),
+}
+
+_lib = None
+_lib_lock = threading.Lock()
+
+def _reset_lock_after_fork():
+    # A lock held by another thread at fork time would never be released in the child.
+    # The dlopen'ed library itself survives fork and stays valid.
+    global _lib_lock
+    _lib_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_lock_after_fork)
+
+def as_bitboards(a):
+    # no copy when a already is a contiguous uint64 array
+    return np.ascontiguousarray(a, dtype=np.uint64)
+
+def board_ref(board):
+    # Board* argument for either a mutable clib.Board or an immutable position.Position
+    if isinstance(board, ctypes.Structure):
+        return ctypes.byref(board)
+    return board._as_parameter_
+
+def library_path():
+    return os.environ.get(EDAX_SO_ENV) or DEFAULT_SO_PATH
+
+def declare_prototypes(lib):
+    for name, (argtypes, restype) in PROTOTYPES.items():
+        # An older edax.so may lack newer entry points; calling one of those raises AttributeError instead
+        func = getattr(lib, name, None)
+        if func is None:
+            continue
+        func.argtypes = argtypes
+        func.restype = restype
+
+def get_lib():
+    """
+        Return the shared edax library, loading it on first call.
+        :return: ctypes.CDLL with all prototypes in PROTOTYPES declared
+    """
+    global _lib
+    lib = _lib
+    if lib is not None:
+        return lib
+    with _lib_lock:
+        if _lib is None:
+            lib = cdll.LoadLibrary(library_path())
+            declare_prototypes(lib)
+            _lib = lib
+    return _lib
+
+class LibC():
+    # py-C interface, a thin view on the process-wide library handle
+    def __init__(self):
+        self.libc = get_lib()
+
+    def get_moves(self, player, opponent):
+        return self.libc.get_moves(player, opponent)
+
+    def get_stderr(self):
+        return self.libc.get_stderr()
+
+    def get_stdout(self):
+        return self.libc.get_stdout()
+
+    def stdin(self):
+        return self.libc.get_stdin()
+
+    def board_print(self, board, player_color=0, io=None):
+        if io is None:
+            # Print to stderr since stdout is buffered and can cause segv
+            io = self.get_stderr()
+        return self.libc.board_print(board_ref(board), player_color, io)
+
+    def board_init(self, board):
+        self.libc.board_init(ctypes.byref(board))
+
+    def board_is_game_over(self, board):
+        return self.libc.board_is_game_over(board_ref(board))
+
+    def board_swap_players(self, board):
+        self.libc.board_swap_players(ctypes.byref(board))
+
+    # not the same name as C func. next must be a mutable Board, board may also be a Position.
+    # Returns the flipped squares (eg. for zobrist.update)
+    def board_update(self, board, move, next):
+        return self.libc.board_next(board_ref(board), move, ctypes.byref(next))
+
+    def bit_count(self, num):
+        return self.libc.bit_count(num)
+
+    def turn_state(self, board, state=None):
+        # moves of both sides, disc counts, pass and game over flags in one call. Pass state to reuse it
+        if state is None:
+            state = TurnState()
+        self.libc.board_turn_state(board_ref(board), ctypes.byref(state))
+        return state
+
+    '''
+        Batch versions of the calls above: one ctypes crossing for a whole array of boards.
+        player/opponent are uint64 arrays of the same length. Output arrays may be passed in (including the input
+        arrays themselves, for in-place updates) to avoid allocation in loops.
+    '''
+    def get_moves_batch(self, player, opponent, out=None):
+        player, opponent = as_bitboards(player), as_bitboards(opponent)
+        if out is None:
+            out = np.empty(len(player), dtype=np.uint64)
+        self.libc.get_moves_batch(player, opponent, out, len(player))
+        return out
+
+    def board_update_batch(self, player, opponent, moves, next_player=None, next_opponent=None):
+        # moves: square per board, -1 passes. Returns (next_player, next_opponent), players swapped as in board_update
+        player, opponent = as_bitboards(player), as_bitboards(opponent)
+        moves = np.ascontiguousarray(moves, dtype=np.int32)
+        if next_player is None:
+            next_player = np.empty(len(player), dtype=np.uint64)
+        if next_opponent is None:
+            next_opponent = np.empty(len(player), dtype=np.uint64)
+        self.libc.board_next_batch(player, opponent, moves, next_player, next_opponent, len(player))
+        return next_player, next_opponent
+
+    def disc_count_batch(self, player, opponent):
+        # returns (player_count, opponent_count) as uint8 arrays
+        player, opponent = as_bitboards(player), as_bitboards(opponent)
+        player_count = np.empty(len(player), dtype=np.uint8)
+        opponent_count = np.empty(len(player), dtype=np.uint8)
+        self.libc.disc_count_batch(player, opponent, player_count, opponent_count, len(player))
+        return player_count, opponent_count
+
+    def board_is_game_over_batch(self, player, opponent):
+        player, opponent = as_bitboards(player), as_bitboards(opponent)
+        over = np.empty(len(player), dtype=np.uint8)
+        self.libc.game_over_batch(player, opponent, over, len(player))
+        return over.view(np.bool_)
@@ -0,0 +1,81 @@
+import time
+
+'''
+    Game clocks - time control of one player: a budget for the whole game plus an increment added after every move
+    (Fischer), eg. "60+0.5". maingame.play runs the clock of the player to move around every get_move, records the time
+    of every ply and, before each move, hands players that accept a time limit (set_move_time) their share of the
+    remaining time. Giving both engines the same time control instead of a -l level compares them at equal cost.
+    A clock without budget only measures.
+'''
+
+# seconds, shortest search of mEdax over NBoard (move-time in edax_src/nboard.c). The console move-time command keeps
+# 1 s at least (options_bound), players with a time control use NBoard
+MIN_MOVE_TIME = 0.1
+MIN_MOVES_TO_GO = 2 # the last moves still get a share, not the whole remaining time
+
+def parse_time_control(text):
+    """
+        :param text: "budget" or "budget+increment" in seconds, eg. "60+0.5"
+        :return: (budget, increment)
+    """
+    budget, _, increment = text.partition("+")
+    return float(budget), float(increment or 0)
+
+class Clock:
+
+    '''
+        budget - seconds for the whole game, None for no limit
+        increment - seconds added after each move
+        remaining - seconds left, overdrawn (negative) once the player exceeded its budget
+        times - seconds spent on each ply of the current game
+    '''
+    def __init__(self, budget=None, increment=0.0):
+        if isinstance(budget, str):
+            budget, increment = parse_time_control(budget)
+        self.budget = budget
+        self.increment = increment
+        self.reset()
+
+    def reset(self):
+        # new game
+        self.remaining = self.budget
+        self.times = []
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter()
+
+    def stop(self):
+        # :return: seconds since start
+        elapsed = time.perf_counter() - self._start
+        self._start = None
+        self.times.append(elapsed)
+        if self.budget is not None:
+            self.remaining += self.increment - elapsed
+        return elapsed
+
+    @property
+    def used(self):
+        return sum(self.times)
+
+    @property
+    def flagged(self):
+        return self.budget is not None and self.remaining < 0
+
+    def allot(self, empties):
+        """
+            Time for the next move: an even share of the remaining time over the moves this player has left plus the
+            increment, never more than the remaining time.
+            :param empties: empty squares of the position to move from
+            :return: seconds, None without budget
+        """
+        if self.budget is None:
+            return None
+        moves_to_go = max(empties // 2, MIN_MOVES_TO_GO)
+        share = self.remaining / moves_to_go + self.increment
+        return max(min(share, self.remaining), MIN_MOVE_TIME)
+
+    def __repr__(self):
+        if self.budget is None:
+            return "Clock(unlimited, used {:.2f}s)".format(self.used)
+        return "Clock({:g}+{:g}, remaining {:.2f}s)".format(self.budget, self.increment, self.remaining)
@@ -0,0 +1,196 @@
+import itertools
+import os
+import sys
+import time
+import numpy as np
+
+'''
+    derived_states pipeline - batches of solved positions flowing from game generation / labelling (producers) to eval
+    net training (consumers) through a broker, so both sides scale and restart independently.
+    Messages are SOLVED_DTYPE arrays as raw bytes. The transport is pluggable, anything with
+        put(topic, payload, timeout)  - blocks while the topic is full (backpressure)
+        get(topic, timeout)           - (message_id, payload) or None, the message stays claimed until acked
+        ack(topic, message_id) / nack(topic, message_id)
+    FileSpoolTransport is the local broker: a spool directory shared by every process of a host (or a shared mount).
+'''
+
+TOPIC = "derived_states"
+SOLVED_DTYPE = np.dtype([("player", "<u8"), ("opponent", "<u8"), ("score", "i1"), ("depth", "i1"), ("move", "i1"),
+                         ("level", "u1")])
+DEFAULT_BATCH_SIZE = 4096 # positions per message
+POLL_INTERVAL = 0.05 # seconds between spool directory scans while blocked
+
+def solved_batch(boards, scores, depths, moves, level):
+    """
+        :param boards: BoardArray of the solved positions
+        :param scores, depths, moves: edaxengine.solve_boards outputs
+        :return: SOLVED_DTYPE array
+    """
+    batch = np.empty(len(boards), dtype=SOLVED_DTYPE)
+    batch["player"], batch["opponent"] = boards.player, boards.opponent
+    batch["score"], batch["depth"], batch["move"] = scores, depths, moves
+    batch["level"] = level
+    return batch
+
+def decode(payload):
+    return np.frombuffer(payload, dtype=SOLVED_DTYPE)
+
+class FileSpoolTransport:
+
+    '''
+        Maildir-style spool: directory/topic/{tmp,new,cur}. put writes tmp/ then renames into new/, get claims a message
+        by renaming it into cur/ (atomic, so each message goes to exactly one consumer), ack deletes it.
+        max_pending - messages (queued + claimed) per topic before put blocks
+    '''
+    def __init__(self, directory, max_pending=64, poll_interval=POLL_INTERVAL):
+        self.directory = directory
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self._counter = itertools.count()
+
+    def _dir(self, topic, box):
+        path = os.path.join(self.directory, topic, box)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def pending(self, topic):
+        return len(os.listdir(self._dir(topic, "new"))) + len(os.listdir(self._dir(topic, "cur")))
+
+    def put(self, topic, payload, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        while self.pending(topic) >= self.max_pending:
+            if deadline is not None and time.time() >= deadline:
+                raise TimeoutError("{} is full ({} pending messages)".format(topic, self.max_pending))
+            time.sleep(self.poll_interval)
+        # names sort in put order, consumers take the oldest first
+        name = "{:020d}-{}-{}".format(time.time_ns(), os.getpid(), next(self._counter))
+        tmp = os.path.join(self._dir(topic, "tmp"), name)
+        with open(tmp, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp, os.path.join(self._dir(topic, "new"), name))
+        return name
+
+    def get(self, topic, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        new, cur = self._dir(topic, "new"), self._dir(topic, "cur")
+        while True:
+            for name in sorted(os.listdir(new)):
+                try:
+                    # claim time for recover, set before the rename: rename keeps the mtime of the put, and a recover
+                    # seeing that one in cur/ would hand the message back while we read it
+                    os.utime(os.path.join(new, name))
+                    os.rename(os.path.join(new, name), os.path.join(cur, name))
+                    with open(os.path.join(cur, name), "rb") as f:
+                        return name, f.read()
+                except FileNotFoundError:
+                    continue # claimed by another consumer, or recovered before we opened it
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def ack(self, topic, message_id):
+        os.unlink(os.path.join(self._dir(topic, "cur"), message_id))
+
+    def nack(self, topic, message_id):
+        # hand the message back for redelivery
+        os.rename(os.path.join(self._dir(topic, "cur"), message_id), os.path.join(self._dir(topic, "new"), message_id))
+
+    def recover(self, topic, older_than):
+        """
+            Redeliver messages claimed more than older_than seconds ago and never acked (their consumer died).
+            :return: number of messages recovered
+        """
+        cur = self._dir(topic, "cur")
+        recovered = 0
+        for name in os.listdir(cur):
+            try:
+                if time.time() - os.path.getmtime(os.path.join(cur, name)) > older_than:
+                    self.nack(topic, name)
+                    recovered += 1
+            except FileNotFoundError:
+                continue # acked meanwhile
+        return recovered
+
+class Producer:
+
+    '''
+        Buffers solved positions and puts them batch_size at a time.
+        timeout - seconds put may block on a full topic before TimeoutError, None waits forever
+    '''
+    def __init__(self, transport, topic=TOPIC, batch_size=DEFAULT_BATCH_SIZE, timeout=None):
+        self.transport = transport
+        self.topic = topic
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.buffer = []
+        self.buffered = 0
+
+    def add(self, batch):
+        # batch: SOLVED_DTYPE array, eg. from solved_batch
+        self.buffer.append(batch)
+        self.buffered += len(batch)
+        if self.buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffered == 0:
+            return
+        data = np.concatenate(self.buffer)
+        for start in range(0, len(data), self.batch_size):
+            self.transport.put(self.topic, data[start:start + self.batch_size].tobytes(), self.timeout)
+        self.buffer = []
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Consumer:
+
+    '''
+        Pulls batches. A batch is acked when the next one is requested, so a consumer that dies mid-batch leaves it
+        claimed for FileSpoolTransport.recover to hand out again.
+    '''
+    def __init__(self, transport, topic=TOPIC):
+        self.transport = transport
+        self.topic = topic
+
+    def get(self, timeout=None):
+        # (message_id, SOLVED_DTYPE array) or None, ack or nack the message_id
+        message = self.transport.get(self.topic, timeout)
+        if message is None:
+            return None
+        return message[0], decode(message[1])
+
+    def ack(self, message_id):
+        self.transport.ack(self.topic, message_id)
+
+    def nack(self, message_id):
+        self.transport.nack(self.topic, message_id)
+
+    def batches(self, timeout=None):
+        # yields SOLVED_DTYPE arrays until no message arrives within timeout (None: forever)
+        while True:
+            message = self.get(timeout)
+            if message is None:
+                return
+            message_id, batch = message
+            yield batch
+            self.ack(message_id)
+
+if __name__ == '__main__':
+    # usage: python derivedstates.py spool_dir [timeout]
+    # prints a line per batch, a stand-in for the training side (producers: edaxanalyzer.publish_solved)
+    transport = FileSpoolTransport(sys.argv[1])
+    timeout = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    total = 0
+    for batch in Consumer(transport).batches(timeout):
+        total += len(batch)
+        print("{} positions, mean score {:+.2f}, {} total".format(len(batch), batch["score"].mean(), total))
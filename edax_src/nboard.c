@@ -60,6 +60,9 @@ static void nboard_send_move(Result *result)
 	char move[4];
 
 	move_to_string(result->move, WHITE, move);
+	// final statistics of the search, so that a client reads depth and nodes of the move from the reply itself
+	nboard_send("nodestats %lld %.2f", result->n_nodes, 0.001 * result->time);
+	nboard_send("status Edax depth %d@%d%%", result->depth, selectivity_table[result->selectivity].percent);
 	nboard_send("=== %s %.2f %.1f", move, 1.0 * result->score, 0.001 * result->time);
 }
 
@@ -164,6 +167,16 @@ void ui_loop_nboard(UI *ui)
 			free(cmd); free(param);			
 			return;
 
+		// search limits (not part of NBoard): "level <n>" or "move-time <time>" for the next searches
+		} else if (strcmp(cmd, "level") == 0) {
+			options_read(cmd, param);
+			options_bound();
+
+		// not through options_bound, which keeps 1 s at least: a search may be as short as 100 ms (search_time_init)
+		} else if (strcmp(cmd, "move-time") == 0) {
+			options.time = MAX(string_to_time(param), 100);
+			options.play_type = EDAX_TIME_PER_MOVE;
+
 		} else if (strcmp(cmd, "ping") == 0) {
 			nboard_send("pong %s", param);
 
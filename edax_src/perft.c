@@ -98,6 +98,22 @@ static void count_game(const Board *board, const int depth, GameStatistics *glob
 	game_statistics_cumulate(global_stats, &stats);
 }
 
+/**
+ * @brief Move count (passes included) at a given depth, the "moves" column of count_games.
+ *
+ * @param board
+ * @param depth
+ * @return number of moves played at ply depth, 1 at depth 0.
+ */
+unsigned long long count_moves(const Board *board, const int depth)
+{
+	GameStatistics stats = GAME_STATISTICS_INIT;
+
+	if (depth <= 0) return 1;
+	count_game(board, depth, &stats);
+	return stats.n_moves + stats.n_passes;
+}
+
 /**
  * @brief Move generator performance test
  *
@@ -16,6 +16,7 @@
 struct Board;
 struct Line;
 void count_games(const struct Board*, const int);
+unsigned long long count_moves(const struct Board*, const int);
 void quick_count_games(const struct Board*, const int, const int);
 void count_positions(const struct Board*, const int, const int);
 void count_shapes(const struct Board*, const int, const int);
@@ -1,5 +1,13 @@
 #include "pyutils.h"
 
+#include "bit.h"
+#include "board.h"
+#include "options.h"
+#include "search.h"
+#include "stats.h"
+
+#include <stdlib.h>
+
 FILE* get_stderr(void) {
     return stderr;
 }
@@ -11,3 +19,245 @@ FILE* get_stdin(void) {
 FILE* get_stdout(void) {
     return stdout;
 }
+
+/* moves of both sides, disc counts and pass/game over flags: replaces get_moves + board_is_game_over + 2 bit_count */
+void board_turn_state(const Board *board, TurnState *state) {
+    state->moves = get_moves(board->player, board->opponent);
+    state->opponent_moves = get_moves(board->opponent, board->player);
+    state->player_count = bit_count(board->player);
+    state->opponent_count = bit_count(board->opponent);
+    state->pass = state->moves == 0 && state->opponent_moves != 0;
+    state->game_over = state->moves == 0 && state->opponent_moves == 0;
+}
+
+/* legal move masks of n boards */
+void get_moves_batch(const unsigned long long *player, const unsigned long long *opponent,
+                     unsigned long long *moves, const long long n) {
+    long long i;
+    for (i = 0; i < n; ++i) {
+        moves[i] = get_moves(player[i], opponent[i]);
+    }
+}
+
+/* legal move masks of n boards stored as a Board array (python BOARD_DTYPE arrays) */
+void get_moves_boards(const Board *boards, unsigned long long *moves, const long long n) {
+    long long i;
+    for (i = 0; i < n; ++i) {
+        moves[i] = get_moves(boards[i].player, boards[i].opponent);
+    }
+}
+
+/* play move[i] on board i. A move outside [0, 63] (-1 in python) is a pass, which only swaps the players */
+void board_next_batch(const unsigned long long *player, const unsigned long long *opponent, const int *move,
+                      unsigned long long *next_player, unsigned long long *next_opponent, const long long n) {
+    long long i;
+    unsigned long long P, O, flipped;
+    for (i = 0; i < n; ++i) {
+        P = player[i];
+        O = opponent[i];
+        if (move[i] < 0 || move[i] >= BOARD_SIZE) {
+            next_player[i] = O;
+            next_opponent[i] = P;
+        } else {
+            flipped = flip[move[i]](P, O);
+            next_player[i] = O ^ flipped;
+            next_opponent[i] = P ^ (flipped | x_to_bit(move[i]));
+        }
+    }
+}
+
+/* disc counts of both sides of n boards */
+void disc_count_batch(const unsigned long long *player, const unsigned long long *opponent,
+                      unsigned char *player_count, unsigned char *opponent_count, const long long n) {
+    long long i;
+    for (i = 0; i < n; ++i) {
+        player_count[i] = (unsigned char) bit_count(player[i]);
+        opponent_count[i] = (unsigned char) bit_count(opponent[i]);
+    }
+}
+
+/* 1 if neither side can move on board i */
+void game_over_batch(const unsigned long long *player, const unsigned long long *opponent,
+                     unsigned char *over, const long long n) {
+    long long i;
+    for (i = 0; i < n; ++i) {
+        over[i] = !can_move(player[i], opponent[i]) && !can_move(opponent[i], player[i]);
+    }
+}
+
+static bool EDAX_INITIALISED = false;
+
+/* tables normally built by main(); must run once before any engine is created */
+void edax_global_init(const char *eval_file) {
+    if (EDAX_INITIALISED) return;
+    edge_stability_init();
+    hash_code_init();
+    hash_move_init();
+    statistics_init();
+    eval_open(eval_file);
+    search_global_init();
+    EDAX_INITIALISED = true;
+}
+
+/* the search result is read back through SearchOutput, nothing to print */
+static void pyengine_observer(Result *result) {
+    (void) result;
+}
+
+/* a search with 2^hash_size hash entries, splitting its tree over n_task threads */
+Search* pyengine_new(const int hash_size, const int n_task) {
+    Search *search = (Search*) malloc(sizeof (Search));
+    if (search == NULL) return NULL;
+    options.hash_table_size = hash_size;
+    options.n_task = n_task;
+    search_init(search);
+    search->options.verbosity = 0;
+    search_set_observer(search, pyengine_observer);
+    return search;
+}
+
+void pyengine_free(Search *search) {
+    search_free(search);
+    free(search);
+}
+
+/* forget everything learnt so far (new game) */
+void pyengine_clear(Search *search) {
+    search_cleanup(search);
+}
+
+/* run one search of board at the given level, within time ms if time > 0 */
+static void pyengine_run(Search *search, const Board *board, const int level, const long long time) {
+    search_set_board(search, board, BLACK);
+    search_set_level(search, level, search->n_empties);
+    if (time > 0) search_set_move_time(search, time);
+    else search_set_game_time(search, options.time);
+    search_run(search);
+}
+
+/* search board at the given level, stopping after time ms (0: no limit). Hash tables are only aged between calls,
+   so earlier searches still help */
+void pyengine_search(Search *search, const Board *board, const int level, const long long time, SearchOutput *out) {
+    const Result *result = search->result;
+    int i;
+
+    pyengine_run(search, board, level, time);
+
+    out->move = result->move;
+    out->score = result->score;
+    out->lower = result->bound[result->move].lower;
+    out->upper = result->bound[result->move].upper;
+    out->depth = result->depth;
+    out->selectivity = result->selectivity;
+    out->accuracy = selectivity_table[result->selectivity].percent;
+    out->n_empties = search->n_empties;
+    out->n_nodes = result->n_nodes;
+    out->time = search_time(search);
+    out->pv_length = result->pv->n_moves;
+    for (i = 0; i < result->pv->n_moves; ++i) out->pv[i] = result->pv->move[i];
+}
+
+/** Work shared by the solve_batch threads */
+typedef struct SolveBatch {
+    const unsigned long long *player, *opponent;
+    int *score, *depth, *move;
+    long long stride;   /**< distance between two boards in player/opponent, 1 for plain arrays, 2 for Board arrays */
+    long long n;
+    long long next;     /**< next board to hand out, protected by lock */
+    int level;
+    Lock lock;
+} SolveBatch;
+
+typedef struct SolveWorker {
+    Search *search;
+    SolveBatch *batch;
+} SolveWorker;
+
+static void* solve_batch_loop(void *v) {
+    SolveWorker *worker = (SolveWorker*) v;
+    SolveBatch *batch = worker->batch;
+    const Result *result = worker->search->result;
+    Board board[1];
+    long long i;
+
+    for (;;) {
+        lock(batch);
+        i = batch->next++;
+        unlock(batch);
+        if (i >= batch->n) break;
+
+        board->player = batch->player[i * batch->stride];
+        board->opponent = batch->opponent[i * batch->stride];
+        pyengine_run(worker->search, board, batch->level, 0);
+        batch->score[i] = result->score;
+        batch->depth[i] = result->depth;
+        batch->move[i] = result->move >= PASS ? -1 : result->move;
+    }
+    return NULL;
+}
+
+static int solve_strided(const unsigned long long *player, const unsigned long long *opponent,
+                         const long long stride, const long long n, const int level, int n_thread,
+                         const int hash_size, int *score, int *depth, int *move) {
+    SolveBatch batch[1];
+    SolveWorker *workers;
+    Thread *threads;
+    int i, n_ok;
+
+    if (n_thread > n) n_thread = (int) n;
+    if (n_thread < 1) n_thread = 1;
+
+    workers = (SolveWorker*) malloc(n_thread * sizeof (SolveWorker));
+    threads = (Thread*) malloc(n_thread * sizeof (Thread));
+    if (workers == NULL || threads == NULL) {
+        free(workers);
+        free(threads);
+        return -1;
+    }
+
+    batch->player = player;
+    batch->opponent = opponent;
+    batch->score = score;
+    batch->depth = depth;
+    batch->move = move;
+    batch->stride = stride;
+    batch->n = n;
+    batch->next = 0;
+    batch->level = level;
+    lock_init(batch);
+
+    // searches are created here, not in the threads: pyengine_new goes through the global options
+    for (n_ok = 0; n_ok < n_thread; ++n_ok) {
+        workers[n_ok].batch = batch;
+        workers[n_ok].search = pyengine_new(hash_size, 1);
+        if (workers[n_ok].search == NULL) break;
+    }
+
+    if (n_ok == n_thread) {
+        for (i = 0; i < n_thread; ++i) thread_create(threads + i, solve_batch_loop, workers + i);
+        for (i = 0; i < n_thread; ++i) thread_join(threads[i]);
+    }
+
+    for (i = 0; i < n_ok; ++i) pyengine_free(workers[i].search);
+    lock_free(batch);
+    free(workers);
+    free(threads);
+
+    return n_ok == n_thread ? 0 : -1;
+}
+
+/*
+ * Search n boards at the given level on n_thread threads, one Search (with 2^hash_size entries) per thread.
+ * Called through ctypes, which releases the GIL for the whole call.
+ * Returns 0, or -1 if the searches cannot be allocated.
+ */
+int solve_batch(const unsigned long long *player, const unsigned long long *opponent, const long long n,
+                const int level, const int n_thread, const int hash_size, int *score, int *depth, int *move) {
+    return solve_strided(player, opponent, 1, n, level, n_thread, hash_size, score, depth, move);
+}
+
+/* solve_batch over a Board array */
+int solve_boards(const Board *boards, const long long n, const int level, const int n_thread, const int hash_size,
+                 int *score, int *depth, int *move) {
+    return solve_strided(&boards->player, &boards->opponent, 2, n, level, n_thread, hash_size, score, depth, move);
+}
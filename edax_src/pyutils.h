@@ -1,5 +1,71 @@
+#include "board.h"
+#include "const.h"
+
 #include <stdio.h>
+#include <stdbool.h>
+
+/*
+ * Python-facing helpers, loaded through ctypes from clib.py.
+ * Change log:
+ *  - get_stderr/get_stdin/get_stdout: expose the C stdio streams for board_print.
+ *  - *_batch: NumPy batch versions of get_moves/board_next/bit_count/board_is_game_over. Every array is a
+ *    contiguous uint64 (boards, masks), int32 (moves) or uint8 (counts, flags) buffer of length n.
+ *  - edax_global_init/pyengine_*: an in-process search engine (one Search per engine) so that python can search
+ *    positions without spawning mEdax. Results come back in a SearchOutput.
+ *  - solve_batch: search an array of boards on a pool of threads, one Search per thread, writing score, depth and
+ *    best move (-1 for pass) into int32 arrays.
+ *  - get_moves_boards/solve_boards: same as get_moves_batch/solve_batch on a Board array, the memory layout of
+ *    python BOARD_DTYPE arrays, so datasets reach C without being split into player/opponent copies.
+ *  - board_turn_state: everything the python game loop needs about a position in one call (TurnState).
+ *  - pyengine_search: optional time limit in ms per search (0 for level only), for clock-controlled games.
+ *  - perft.py calls count_moves (perft.c, declared in perft.h): the per-depth move count of count_games.
+ */
+
+struct Search;
+
+/** State of a position from the side to move's point of view */
+typedef struct TurnState {
+    unsigned long long moves;           /**< legal moves of the player */
+    unsigned long long opponent_moves;  /**< legal moves of the opponent */
+    int player_count;                   /**< player discs */
+    int opponent_count;                 /**< opponent discs */
+    int pass;                           /**< player has to pass (opponent can move) */
+    int game_over;                      /**< nobody can move */
+} TurnState;
+
+/** Search result in a flat, ctypes friendly layout */
+typedef struct SearchOutput {
+    int move;                       /**< best move, PASS if none */
+    int score;                      /**< best score */
+    int lower, upper;               /**< score bounds of the best move */
+    int depth;                      /**< searched depth */
+    int selectivity;                /**< searched selectivity level */
+    int accuracy;                   /**< selectivity as a percentage, 100 for an exact search */
+    int n_empties;                  /**< empties of the searched position */
+    unsigned long long n_nodes;     /**< searched node count */
+    long long time;                 /**< searched time in ms */
+    int pv_length;                  /**< principal variation length */
+    int pv[GAME_SIZE];              /**< principal variation */
+} SearchOutput;
 
 FILE* get_stderr(void);
 FILE* get_stdin(void);
 FILE* get_stdout(void);
+
+void get_moves_batch(const unsigned long long*, const unsigned long long*, unsigned long long*, const long long);
+void board_turn_state(const Board*, TurnState*);
+void get_moves_boards(const Board*, unsigned long long*, const long long);
+void board_next_batch(const unsigned long long*, const unsigned long long*, const int*,
+                      unsigned long long*, unsigned long long*, const long long);
+void disc_count_batch(const unsigned long long*, const unsigned long long*, unsigned char*, unsigned char*,
+                      const long long);
+void game_over_batch(const unsigned long long*, const unsigned long long*, unsigned char*, const long long);
+
+void edax_global_init(const char*);
+struct Search* pyengine_new(const int, const int);
+void pyengine_free(struct Search*);
+void pyengine_clear(struct Search*);
+void pyengine_search(struct Search*, const Board*, const int, const long long, SearchOutput*);
+int solve_batch(const unsigned long long*, const unsigned long long*, const long long, const int, const int, const int,
+                int*, int*, int*);
+int solve_boards(const Board*, const long long, const int, const int, const int, int*, int*, int*);
@@ -1,3 +1,5 @@
+import argparse
+import json
 import timeit
 
 import numpy as np
@@ -5,6 +7,13 @@ import re
 import subprocess
 import os
 from utils import timer
+import edaxengine
+import searchcache
+import solveserver
+from boardarray import BoardArray
+from players.edax_player_solve import obf_to_bitboards
+from derivedstates import Producer, solved_batch
+from checkpoint import load_shards, save_shard, shard_path
 from multiprocessing import Process, Queue
 
 # globals
@@ -12,15 +21,19 @@ BOARD_SIZE = 64 # total number of squares in a board
 RANDOM_OBF_BATCH_SIZE = 100000 # file I/O batch size for random_obf. Single process takes ~5s to process a batch of
 # this size on intel i9
 RANDOM_OBF_PROCESSES = 8 # number of worker procs random_obf utilize
+LABEL_SHARD_SIZE = 65536 # positions per label_obf shard, the work lost when a labelling run is interrupted
+LABEL_MANIFEST = "labels.json"
 
 
-def compute_one_verbose2_problem(lines):
+# verbose: print the lines while parsing
+def compute_one_verbose2_problem(lines, verbose=False):
 
     lines.reverse()
     for x in lines:
-        print(x)
+        if verbose:
+            print(x)
         m = re.search(
-            r"([0-9]+)\s+([-+][0-9]{2})\s+([0-9.:]+)\s+([0-9]+)\s+([0-9]*)\s+(([a-hA-H][1-8]\s?)+)",
+            r"([0-9]+)\s+\??([-+][0-9]{2})\s+([0-9.:]+)\s+([0-9]+)\s+([0-9]*)\s+(([a-hA-H][1-8]\s?)+)",
             x,
         )
         if m is not None:
@@ -38,7 +51,7 @@ def compute_one_verbose2_problem(lines):
             }
 
         m = re.search(
-            r"([0-9]+)@([0-9]+)%\s+([-+][0-9]{2})\s+([0-9.:]+)\s+([0-9]+)\s+([0-9]*)\s+(([a-hA-H][1-8]\s?)+)",
+            r"([0-9]+)@([0-9]+)%\s+\??([-+][0-9]{2})\s+([0-9.:]+)\s+([0-9]+)\s+([0-9]*)\s+(([a-hA-H][1-8]\s?)+)",
             x,
         )
         if m is not None:
@@ -110,17 +123,18 @@ def obf_generator(q, state_cnt, empties):
     if len(result) > 0:
         q.put('\n'.join(result) + '\n')
 
-def file_writer(q, file_path):
+def file_writer(q, file_path, mode='w'):
     """
         consume from mp/mt queue and writes to a file
         :param file_path: file to write too
         :param q: mp/mt queue
+        :param mode: 'a' to append to an interrupted run
         :return:
     """
     # Ensure the directory exists
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
 
-    with open(file_path, 'w') as f:
+    with open(file_path, mode) as f:
         while True:
             data = q.get()
             if data == "STOP":
@@ -128,20 +142,37 @@ def file_writer(q, file_path):
                 # Make sure \n is appended in {data}
             f.write(f'{data}')
 
+def complete_lines(filename):
+    """
+        Cut the torn last line an interrupted writer may leave and count the complete ones.
+        :return: number of complete lines in filename
+    """
+    with open(filename, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        f.truncate(end)
+    return data.count(b'\n', 0, end)
+
 @timer
-def random_obf(empties, cnt, filename):
+def random_obf(empties, cnt, filename, resume=False):
     """
         Generate obf file containing many game states all with the same number of empties. NOT guarenteed to be a state reachable from normal game play.
         :param empties: number of empties
         :param cnt: number of states to generate\
         :param filename: filename
+        :param resume: keep the states an interrupted run already wrote to filename and only generate the rest
         :return:
     """
     def data_producer(data, q):
         q.put(data)
 
+    existing = complete_lines(filename) if resume and os.path.exists(filename) else 0
+    cnt -= existing
+    if cnt <= 0:
+        return
+
     q = Queue()
-    writer_process = Process(target=file_writer, args=(q, filename))
+    writer_process = Process(target=file_writer, args=(q, filename, 'a' if existing else 'w'))
     writer_process.start()
 
     workers = []
@@ -159,38 +190,118 @@ def random_obf(empties, cnt, filename):
     q.put("STOP")
     writer_process.join()
 
-def analyze_obf_entry(obf_entry, lvl):
+@timer
+def convert_obf(obf_file, npy_file):
+    """
+        Convert an obf file (eg. from random_obf) to a BoardArray .npy file once, so later runs mmap it
+        (BoardArray.load) instead of parsing text.
+        :param obf_file: obf file to read
+        :param npy_file: .npy file to write
+        :return: the converted BoardArray
+    """
+    boards = BoardArray.load_obf(obf_file)
+    boards.save(npy_file)
+    return boards
+
+def publish_solved(boards, lvl, transport, batch_size=None, n_threads=None, cache=None):
+    """
+        Solve positions in process (edaxengine.solve_boards) and push them to the derived_states topic, chunk by chunk,
+        so training consumers start on the first batches while the rest is solved. Blocks while the topic is full.
+        :param boards: BoardArray, eg. BoardArray.load of a convert_obf file or GameRecords.replay positions
+        :param lvl: edax level
+        :param transport: derivedstates transport, eg. FileSpoolTransport
+        :param batch_size: positions per message, defaults to derivedstates.DEFAULT_BATCH_SIZE
+        :param cache: searchcache.SearchCache, defaults to searchcache.get_cache(). Cached positions are not searched
+        :return: number of positions published
+    """
+    producer = Producer(transport) if batch_size is None else Producer(transport, batch_size=batch_size)
+    with producer:
+        for start in range(0, len(boards), producer.batch_size):
+            chunk = boards[start:start + producer.batch_size]
+            scores, depths, moves = searchcache.solve_boards(chunk, lvl, cache, n_threads)
+            producer.add(solved_batch(chunk, scores, depths, moves, lvl))
+    return len(boards)
+
+@timer
+def label_obf(obf_file, lvl, out_dir, shard_size=LABEL_SHARD_SIZE, resume=False, n_threads=None, cache=None):
     """
-        Aux function, takes in an obf entry (a game state), generates 2 edax search results, one at lvl1 (depth 0),
-        one at @param lvl, ideally reaching endgame for accuracy. Used to enhance the eval function.
+        Solve every position of an obf (or convert_obf .npy) file at level lvl in process, the checkpointed
+        counterpart of eval_obf.sh. Solutions are derivedstates.SOLVED_DTYPE shards in out_dir, each written once
+        complete (checkpoint.save_shard), so an interrupted run loses the shard in progress only.
+        :param resume: skip the shards already in out_dir. Without it out_dir must not hold a labelling run
+        :param cache: searchcache.SearchCache, defaults to searchcache.get_cache(). Cached positions are not searched
+        :return: SOLVED_DTYPE array of every position, memory-mapped from the shards
+    """
+    boards = BoardArray.load(obf_file) if obf_file.endswith(".npy") else BoardArray.load_obf(obf_file)
+    manifest = {"source": os.path.abspath(obf_file), "positions": len(boards), "level": lvl, "shard_size": shard_size}
+    manifest_path = os.path.join(out_dir, LABEL_MANIFEST)
+    if os.path.exists(manifest_path):
+        if not resume:
+            raise FileExistsError("{} holds a labelling run, resume it or remove it".format(out_dir))
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise ValueError("{} labels another run: {}".format(out_dir, previous))
+    else:
+        os.makedirs(out_dir, exist_ok=True)
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+
+    n_shards = (len(boards) + shard_size - 1) // shard_size
+    for i in range(n_shards):
+        if os.path.exists(shard_path(out_dir, i)):
+            continue
+        chunk = boards[i * shard_size:(i + 1) * shard_size]
+        scores, depths, moves = searchcache.solve_boards(chunk, lvl, cache, n_threads)
+        save_shard(out_dir, i, solved_batch(chunk, scores, depths, moves, lvl))
+    return load_shards(out_dir, n_shards)
+
+def analyze_obf_entry(obf_entry, lvl, engine=None):
+    """
+        Aux function, takes in an obf entry (a game state) and searches it at @param lvl, ideally reaching endgame for
+        accuracy. Used to enhance the eval function.
         :param obf_entry: game state to analyze
         :param lvl: high eval lvl
-        :return: (lvl1_result, lvl{lvl}_result)
-    """
-    with open("resources/tmp_obf_file", "w") as f:
-        f.write(obf_entry)
-    proc = subprocess.Popen(
-        ['./bin/mEdax', '-solve', "tmp_obf_file", '-l', str(lvl)],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        universal_newlines=True,
-        )
-    result_stdout = []
-    while True:
-        line = proc.stdout.readline()
-        if not line and proc.poll() is not None:
-            break
-        if line:
-            result_stdout.append(line.rstrip())
+        :param engine: optional edaxengine.EdaxEngine, searches in-process instead of asking the mEdax solve server
+        :return: dict of the search: move (-1 for pass), score, depth, accuracy, nodes and time (ms) from the solve
+                 server (solveserver.SolveServer.submit), the keys of EdaxEngine.search with engine
+    """
+    if engine is not None:
+        analyze = engine.search(obf_to_bitboards(obf_entry), lvl)
+        print(analyze["depth"])
+        print(analyze["score"])
+        return analyze
 
-    analyze = compute_one_verbose2_problem(result_stdout)
+    analyze = solveserver.get_server().solve(obf_entry, lvl)
 
     print(analyze["depth"])
     print(analyze["score"])
+    return analyze
 
 if __name__ == '__main__':
-    random_obf(12, 100, "data/test/obf")
+    # python edaxanalyzer.py random 12 100 data/test/obf [--resume]
+    # python edaxanalyzer.py label data/test/obf 16 data/test/labels [--resume]
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    random_parser = commands.add_parser("random", help="random_obf: random positions with a number of empties")
+    random_parser.add_argument("empties", type=int)
+    random_parser.add_argument("cnt", type=int)
+    random_parser.add_argument("filename")
+    label_parser = commands.add_parser("label", help="label_obf: solve a position file into shards")
+    label_parser.add_argument("obf_file")
+    label_parser.add_argument("lvl", type=int)
+    label_parser.add_argument("out_dir")
+    label_parser.add_argument("--shard-size", type=int, default=LABEL_SHARD_SIZE)
+    label_parser.add_argument("--cache", help="search cache file (searchcache.py), defaults to $SEARCH_CACHE")
+    for command_parser in (random_parser, label_parser):
+        command_parser.add_argument("--resume", action="store_true", help="continue an interrupted run")
+    args = parser.parse_args()
+    if getattr(args, "cache", None):
+        searchcache.set_cache_path(args.cache)
+    if args.command == "random":
+        random_obf(args.empties, args.cnt, args.filename, args.resume)
+    else:
+        label_obf(args.obf_file, args.lvl, args.out_dir, args.shard_size, args.resume)
 
     # extract_scores("a.txt")
     # analyze_obf_entry("X-OOOOXOO--OO--OX-XOXXXXXO--XO-OOOX---OO--OO-OOOXXOOOOXXXOXXO-XX X;", 16)
@@ -0,0 +1,165 @@
+import ctypes
+import os
+import threading
+import numpy as np
+
+from clib import SearchOutput, as_bitboards, board_ref, get_lib
+
+'''
+    In-process edax search engine.
+    EdaxPlayerSolve and edaxanalyzer used to write every position to a file, spawn `mEdax -solve` and regex-parse its
+    stdout. An EdaxEngine instead owns one edax Search object inside edax.so for its whole lifetime: no process
+    spawn, no text round trip, and the hash tables stay warm from one call to the next.
+    Eval weights: $EDAX_EVAL if set, otherwise edax_data/eval.dat next to this file (same default as mEdax run from
+    the repo root).
+'''
+
+EDAX_EVAL_ENV = "EDAX_EVAL"
+DEFAULT_EVAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "edax_data", "eval.dat")
+PASS = 64 # edax square index of a pass
+DEFAULT_LEVEL = 21 # mEdax default
+DEFAULT_HASH_SIZE = 21 # log2 of hash entries, mEdax default
+
+_init_lock = threading.Lock()
+_initialised = False
+
+def global_init(eval_file=None):
+    """
+        Build edax global tables and load the eval weights. Done once per process, later calls are no-ops.
+        :param eval_file: eval weights, defaults to $EDAX_EVAL or edax_data/eval.dat
+    """
+    global _initialised
+    if _initialised:
+        return
+    with _init_lock:
+        if _initialised:
+            return
+        eval_file = eval_file or os.environ.get(EDAX_EVAL_ENV) or DEFAULT_EVAL_PATH
+        # edax exits the whole process on a missing file, fail in python instead
+        if not os.path.isfile(eval_file):
+            raise FileNotFoundError("edax eval weights not found: {}".format(eval_file))
+        get_lib().edax_global_init(eval_file.encode('utf-8'))
+        _initialised = True
+
+def solve_batch(player, opponent, level, n_threads=None, hash_size=DEFAULT_HASH_SIZE, eval_file=None):
+    """
+        Search many positions at one level on a pool of C threads, one edax search per thread. Replaces writing an obf
+        file, running `mEdax -solve file -l N` (eval_obf.sh) and parsing the text back. The GIL is released during the
+        call, so other python threads keep running.
+        :param player: uint64 array of side-to-move bitboards
+        :param opponent: uint64 array of opponent bitboards
+        :param level: edax level
+        :param n_threads: worker threads, defaults to all cores
+        :param hash_size: log2 of hash entries per thread
+        :return: (scores, depths, moves) int32 arrays, move -1 for pass
+    """
+    global_init(eval_file)
+    player, opponent = as_bitboards(player), as_bitboards(opponent)
+    n = len(player)
+    scores = np.empty(n, dtype=np.int32)
+    depths = np.empty(n, dtype=np.int32)
+    moves = np.empty(n, dtype=np.int32)
+    if n == 0:
+        return scores, depths, moves
+    if get_lib().solve_batch(player, opponent, n, level, n_threads or os.cpu_count() or 1, hash_size,
+                             scores, depths, moves) != 0:
+        raise MemoryError("cannot allocate edax searches for solve_batch")
+    return scores, depths, moves
+
+def solve_boards(boards, level, n_threads=None, hash_size=DEFAULT_HASH_SIZE, eval_file=None):
+    """
+        solve_batch for a boardarray.BoardArray (or BOARD_DTYPE array): the positions are read in place, a memory-mapped
+        dataset is never copied. A strided view (eg. boards[::2]) is compacted first.
+        :return: (scores, depths, moves) int32 arrays, move -1 for pass
+    """
+    global_init(eval_file)
+    data = np.ascontiguousarray(getattr(boards, "data", boards))
+    n = len(data)
+    scores = np.empty(n, dtype=np.int32)
+    depths = np.empty(n, dtype=np.int32)
+    moves = np.empty(n, dtype=np.int32)
+    if n == 0:
+        return scores, depths, moves
+    if get_lib().solve_boards(data, n, level, n_threads or os.cpu_count() or 1, hash_size, scores, depths, moves) != 0:
+        raise MemoryError("cannot allocate edax searches for solve_boards")
+    return scores, depths, moves
+
+def option_level(options, default=DEFAULT_LEVEL):
+    # value of -l/-level in an mEdax option list
+    for i in range(len(options) - 1):
+        if options[i] in ("-l", "-level"):
+            return int(options[i + 1])
+    return default
+
+def square_to_coord(x):
+    if x == PASS:
+        return "ps"
+    return chr(ord('a') + (x % 8)) + str(1 + (x // 8))
+
+class EdaxEngine:
+
+    '''
+        One persistent edax search. Not thread safe: use one engine per thread.
+        level - edax -l level used when search() is not given one
+        hash_size - log2 of the number of hash entries (edax -h)
+        n_tasks - threads the search splits its tree over (edax -n)
+    '''
+    def __init__(self, level=DEFAULT_LEVEL, hash_size=DEFAULT_HASH_SIZE, n_tasks=1, eval_file=None):
+        global_init(eval_file)
+        self.libc = get_lib()
+        self.level = level
+        self.hash_size = hash_size
+        self.n_tasks = n_tasks
+        self.search_ptr = self.libc.pyengine_new(hash_size, n_tasks)
+        if not self.search_ptr:
+            raise MemoryError("cannot allocate an edax search")
+        self.output = SearchOutput()
+
+    def search(self, board, level=None, move_time=None):
+        """
+            Search a position for the side to move (board.player).
+            :param board: utils.Board or position.Position
+            :param level: edax level, defaults to the engine level
+            :param move_time: seconds the search may take (clock.MIN_MOVE_TIME at least), None for the level only
+            :return: dict with the keys of compute_one_verbose2_problem plus move (-1 for pass), score and time (ms)
+        """
+        if self.search_ptr is None:
+            raise ValueError("search on a closed EdaxEngine")
+        out = self.output
+        self.libc.pyengine_search(self.search_ptr, board_ref(board), self.level if level is None else level,
+                                  0 if move_time is None else max(int(move_time * 1000), 1), ctypes.byref(out))
+        return {
+            "move": -1 if out.move >= PASS else out.move, # PASS or NOMOVE
+            "score": out.score,
+            "perfect": out.accuracy == 100 and out.depth == out.n_empties,
+            "depth": out.depth,
+            "accuracy": out.accuracy,
+            "nodes": out.n_nodes,
+            "time": out.time,
+            "score_lowerbound": out.lower,
+            "score_upperbound": out.upper,
+            "principal_variation": [square_to_coord(out.pv[i]) for i in range(out.pv_length)],
+        }
+
+    def get_move(self, board, level=None, move_time=None):
+        return self.search(board, level, move_time)["move"]
+
+    def clear(self):
+        # drop hash contents, eg. between unrelated games
+        self.libc.pyengine_clear(self.search_ptr)
+
+    def close(self):
+        if self.search_ptr is not None:
+            self.libc.pyengine_free(self.search_ptr)
+            self.search_ptr = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # libc may already be gone at interpreter shutdown
+        if getattr(self, "search_ptr", None) is not None and getattr(self, "libc", None) is not None:
+            self.close()
@@ -0,0 +1,32 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import LibC
+from maingame import play
+from players.player import RandomPlayer
+from players.edax_player import EdaxPlayer
+
+# report: games/s of edax vs random at a low level, with the engine kept warm across games (pool) and with a new
+# mEdax per game (cold, the previous EdaxPlayer behaviour). Run from the directory holding bin/mEdax.
+# usage: python exp/bench_edax_pool.py [games] [level]
+
+def bench(name, cold, n, level):
+    libc = LibC()
+    players = [EdaxPlayer("edax", "-l", level), RandomPlayer("random")]
+    start = time.time()
+    for _ in range(n):
+        play(players, libc)
+        if cold:
+            players[0].engine.kill()
+            players[0].engine = None
+    t = time.time() - start
+    players[0].close()
+    print(f"{name:>6}: {n} games {t:10.4f}s {n / t:10.1f} games/s, engines started {players[0].pool.started}")
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    level = sys.argv[2] if len(sys.argv) > 2 else "2"
+    bench("cold", True, n, level)
+    bench("warm", False, n, level)
@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import LibC
+from maingame import play
+from observers import BoardPrinter, GameMetrics
+from players.player import RandomPlayer
+
+# report: games/s of the game loop, random vs random in one process, silent vs with observers. The printing run writes
+# to /dev/null, so it measures formatting only, a terminal is slower still.
+# usage: python exp/bench_observers.py [games]
+
+def bench(name, players, libc, observers, n):
+    start = time.time()
+    for _ in range(n):
+        play(players, libc, observers)
+    t = time.time() - start
+    print(f"{name:>16}: {n} games {t:10.4f}s {n / t:10.1f} games/s")
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    libc = LibC()
+    players = [RandomPlayer("random player a"), RandomPlayer("random player b")]
+    bench("silent", players, libc, (), n)
+    bench("GameMetrics", players, libc, [GameMetrics()], n)
+    # board_print writes to the C stderr, redirect the file descriptors for the printing run
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    saved = os.dup(1), os.dup(2)
+    sys.stdout.flush()
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    try:
+        start = time.time()
+        for _ in range(n):
+            play(players, libc, [BoardPrinter(libc)])
+        t = time.time() - start
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+    print(f"{'BoardPrinter':>16}: {n} games {t:10.4f}s {n / t:10.1f} games/s")
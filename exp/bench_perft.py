@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import Board, LibC
+from perft import perft
+from boardarray import BoardArray
+from players.edax_player import get_moves as py_get_moves
+
+# report: move generator speed, perft from the initial board. Node counts must agree for every generator; the python
+# generators share the C board update so only move generation differs.
+# usage: python exp/bench_perft.py [max_depth] [max_python_depth]
+
+LIBC = LibC()
+
+def board_next(player, opponent, x):
+    next = Board(0, 0)
+    LIBC.board_update(Board(player, opponent), x, next)
+    return next.player, next.opponent
+
+def perft_with(move_gen, player, opponent, depth):
+    # count_game from edax perft.c with a pluggable move generator
+    moves = move_gen(player, opponent)
+    if depth == 1:
+        if moves:
+            return moves.bit_count()
+        return 1 if move_gen(opponent, player) else 0
+    if moves == 0:
+        if move_gen(opponent, player) == 0:
+            return 0
+        return perft_with(move_gen, opponent, player, depth - 1)
+    total = 0
+    while moves:
+        x = (moves & -moves).bit_length() - 1
+        moves &= moves - 1
+        total += perft_with(move_gen, *board_next(player, opponent, x), depth - 1)
+    return total
+
+def env_move_gen():
+    # OthelloEnv.get_valid_board_pos, boards converted to its (8, 8) grid with the side to move as black
+    from agents.envs.othello_env import OthelloEnv, black_player
+    env = OthelloEnv()
+    def move_gen(player, opponent):
+        env.game_board = BoardArray.from_bitboards([player], [opponent]).to_grid(
+            player_value=black_player["id"], opponent_value=-black_player["id"])[0]
+        moves = 0
+        for x, y in env.get_valid_board_pos(black_player):
+            moves |= 1 << (x * 8 + y)
+        return moves
+    return move_gen
+
+def bench(name, count, depth):
+    start = time.time()
+    n = count(depth)
+    t = time.time() - start
+    print(f"{name:>24} depth {depth:2d}: {n:>12d} moves {t:10.4f}s {n / max(t, 1e-9):14.0f} N/s")
+    return n
+
+if __name__ == '__main__':
+    max_depth = int(sys.argv[1]) if len(sys.argv) > 1 else 9
+    max_python_depth = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    board = Board(0, 0)
+    LIBC.board_init(board)
+    generators = [("edax_player.get_moves", py_get_moves)]
+    try:
+        generators.append(("OthelloEnv", env_move_gen()))
+    except ImportError as e:
+        print(f"OthelloEnv skipped: {e}")
+
+    for depth in range(1, max_depth + 1):
+        ref = bench("C count_moves", lambda d: perft(board, d, parallel=False), depth)
+        bench("C count_moves parallel", lambda d: perft(board, d, parallel=True), depth)
+        if depth <= max_python_depth:
+            for name, move_gen in generators:
+                n = bench(name, lambda d: perft_with(move_gen, board.player, board.opponent, d), depth)
+                if n != ref:
+                    print(f"MISMATCH: {name} counts {n}, C counts {ref}")
+        print("====================================================")
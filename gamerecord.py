@@ -0,0 +1,266 @@
+import json
+import os
+import numpy as np
+
+from clib import Board, LibC
+from boardarray import BoardArray
+from players.edax_player_solve import option_level
+
+'''
+    Binary game records - one byte per move, PASS (64) for a pass, behind a small fixed header per game.
+    A file is a sequence of self-contained chunks, each written with a single append:
+        CHUNK_DTYPE header (magic, number of records, number of move bytes, size of the names block)
+        names - utf-8 JSON list of the player names referenced by this chunk
+        RECORD_DTYPE x n_records
+        move bytes of every record, in record order
+        timed chunks (CHUNK_MAGIC_TIMED) only: float32 seconds spent on each move byte, NaN for untimed games
+    Chunks can be appended by several processes to the same file (one O_APPEND write per chunk). A game costs 11 bytes
+    plus its moves, ~70 bytes, and all records of a file load with a loop over chunks only.
+    Player 0 moves first from the start position: the initial board, or opening `opening` of an opening set.
+'''
+
+CHUNK_MAGIC = 0x4347544F # "OTGC"
+CHUNK_MAGIC_TIMED = 0x5447544F # "OTGT"
+CHUNK_DTYPE = np.dtype([("magic", "<u4"), ("n_records", "<u4"), ("n_move_bytes", "<u4"), ("names_size", "<u4")])
+RECORD_DTYPE = np.dtype([("n_plies", "u1"), ("player0", "u1"), ("player1", "u1"), ("level0", "u1"), ("level1", "u1"),
+                         ("discs0", "u1"), ("discs1", "u1"), ("opening", "<u4")])
+PASS = 64
+NO_OPENING = 0xFFFFFFFF
+NO_LEVEL = 0
+DEFAULT_CHUNK_SIZE = 4096 # records buffered before a chunk is written
+
+def player_level(player):
+    # -l option of an edax player, NO_LEVEL for others
+    return min(option_level(getattr(player, "options", []), NO_LEVEL), 255)
+
+def encode_moves(moves):
+    # moves 0..63 / -1 (pass) -> record bytes
+    return bytes(PASS if m < 0 else m for m in moves)
+
+class GameRecordWriter:
+
+    '''
+        Append-only writer, records are buffered and written chunk_size at a time (and on flush/close).
+    '''
+    def __init__(self, filename, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.fd = os.open(filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._clear()
+
+    def _clear(self):
+        self.names = []
+        self.headers = []
+        self.moves = []
+        self.times = [] # (number of move bytes, seconds per move or None) per add
+        self.timed = False
+
+    def _name_index(self, name):
+        if name not in self.names:
+            self.names.append(name)
+        return self.names.index(name)
+
+    def add(self, players, moves, cnts, opening=NO_OPENING, times=None):
+        """
+            :param players: the two player objects (or names), players[0] moved first
+            :param moves: moves played, -1 for passes
+            :param cnts: final discs of players[0] and players[1]
+            :param opening: index of the start position in the opening set, NO_OPENING for the initial board
+            :param times: seconds spent on each move, None if the game had no clocks
+        """
+        names = [getattr(p, "name", p) for p in players]
+        levels = [player_level(p) if not isinstance(p, str) else NO_LEVEL for p in players]
+        self.headers.append((len(moves), self._name_index(names[0]), self._name_index(names[1]), levels[0], levels[1],
+                             cnts[0], cnts[1], opening))
+        self.moves.append(encode_moves(moves))
+        self.times.append((len(moves), times))
+        self.timed = self.timed or times is not None
+        if len(self.headers) >= self.chunk_size:
+            self.flush()
+
+    def add_vector_game(self, game, openings=None):
+        # every game of a finished vectorgame.VectorGame, openings: opening index per game
+        cnts, _ = game.result()
+        names = [self._name_index(p.name) for p in game.players]
+        levels = [player_level(p) for p in game.players]
+        headers = np.empty(len(game), dtype=RECORD_DTYPE)
+        headers["n_plies"] = game.n_plies
+        headers["player0"], headers["player1"] = names
+        headers["level0"], headers["level1"] = levels
+        headers["discs0"], headers["discs1"] = cnts[:, 0], cnts[:, 1]
+        headers["opening"] = NO_OPENING if openings is None else openings
+        history = np.where(game.history < 0, PASS, game.history).astype(np.uint8)
+        moves = history[np.arange(game.history.shape[1]) < game.n_plies[:, None]]
+        self.headers.extend(headers.tolist())
+        self.moves.append(moves.tobytes())
+        self.times.append((len(moves), None))
+        if len(self.headers) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.headers) == 0:
+            return
+        times = None
+        if self.timed:
+            times = np.concatenate([np.full(n, np.nan, dtype=np.float32) if t is None else np.asarray(t, np.float32)
+                                    for n, t in self.times])
+        self.write_chunk(self.names, np.array(self.headers, dtype=RECORD_DTYPE), b"".join(self.moves), times)
+        self._clear()
+
+    def write_chunk(self, names, headers, moves, times=None):
+        # headers: RECORD_DTYPE array indexing into names, moves: their move bytes, times: None or float32 per move
+        names = json.dumps(names).encode("utf-8")
+        magic = CHUNK_MAGIC if times is None else CHUNK_MAGIC_TIMED
+        chunk = np.array([(magic, len(headers), len(moves), len(names))], dtype=CHUNK_DTYPE)
+        data = chunk.tobytes() + names + headers.tobytes() + moves
+        if times is not None:
+            data += np.asarray(times, dtype="<f4").tobytes()
+        # one write per chunk, so chunks appended by concurrent writers never interleave
+        written = os.write(self.fd, data)
+        if written != len(data):
+            raise OSError("short write to {}: {}/{} bytes".format(self.filename, written, len(data)))
+
+    def close(self):
+        if self.fd is not None:
+            self.flush()
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class GameRecords:
+
+    '''
+        All records of a file.
+        names - player names, header player0/player1 index into it
+        header - RECORD_DTYPE array
+        moves - uint8 array of every move byte, game i is moves[offsets[i]:offsets[i] + header["n_plies"][i]]
+        times - float32 seconds per move byte (NaN for games without clocks), None if no game of the file was timed
+    '''
+    def __init__(self, names, header, moves, times=None):
+        self.names = names
+        self.header = header
+        self.moves = moves
+        self.times = times
+        self.offsets = np.zeros(len(header), dtype=np.int64)
+        np.cumsum(header["n_plies"][:-1], out=self.offsets[1:])
+
+    @classmethod
+    def load(cls, filename, mmap=True):
+        if os.path.getsize(filename) == 0:
+            return cls([], np.empty(0, dtype=RECORD_DTYPE), np.empty(0, dtype=np.uint8))
+        data = np.memmap(filename, dtype=np.uint8, mode="r") if mmap else np.fromfile(filename, dtype=np.uint8)
+        names, headers, moves, times = [], [], [], []
+        timed = False
+        pos = 0
+        while pos < len(data):
+            chunk = data[pos:pos + CHUNK_DTYPE.itemsize].view(CHUNK_DTYPE)[0]
+            if chunk["magic"] not in (CHUNK_MAGIC, CHUNK_MAGIC_TIMED):
+                raise ValueError("{}: bad chunk at byte {}".format(filename, pos))
+            pos += CHUNK_DTYPE.itemsize
+            chunk_names = json.loads(data[pos:pos + chunk["names_size"]].tobytes().decode("utf-8"))
+            pos += int(chunk["names_size"])
+            header = data[pos:pos + chunk["n_records"] * RECORD_DTYPE.itemsize].view(RECORD_DTYPE).copy()
+            pos += header.nbytes
+            # chunk-local player indices -> file-wide ones
+            for name in chunk_names:
+                if name not in names:
+                    names.append(name)
+            remap = np.array([names.index(name) for name in chunk_names], dtype=np.uint8)
+            if len(remap):
+                header["player0"], header["player1"] = remap[header["player0"]], remap[header["player1"]]
+            headers.append(header)
+            moves.append(data[pos:pos + chunk["n_move_bytes"]])
+            pos += int(chunk["n_move_bytes"])
+            if chunk["magic"] == CHUNK_MAGIC_TIMED:
+                n_time_bytes = int(chunk["n_move_bytes"]) * 4
+                times.append(data[pos:pos + n_time_bytes].view("<f4"))
+                pos += n_time_bytes
+                timed = True
+            else:
+                times.append(np.full(int(chunk["n_move_bytes"]), np.nan, dtype=np.float32))
+        return cls(names, np.concatenate(headers), np.concatenate(moves), np.concatenate(times) if timed else None)
+
+    def save(self, filename, chunk_size=DEFAULT_CHUNK_SIZE):
+        # rewrite into chunk_size chunks, eg. to compact a file of one-game chunks
+        with GameRecordWriter(filename, chunk_size) as writer:
+            for start in range(0, len(self), chunk_size):
+                header = self.header[start:start + chunk_size]
+                move_end = self.offsets[start + len(header) - 1] + header["n_plies"][-1]
+                times = None if self.times is None else self.times[self.offsets[start]:move_end]
+                writer.write_chunk(self.names, header, self.moves[self.offsets[start]:move_end].tobytes(), times)
+
+    def __len__(self):
+        return len(self.header)
+
+    def game_moves(self, i):
+        # move list of game i, -1 for passes
+        moves = self.moves[self.offsets[i]:self.offsets[i] + self.header["n_plies"][i]].astype(np.int8)
+        return np.where(moves == PASS, -1, moves).tolist()
+
+    def game_times(self, i):
+        # seconds spent on each move of game i, None if it had no clocks
+        if self.times is None:
+            return None
+        times = self.times[self.offsets[i]:self.offsets[i] + self.header["n_plies"][i]]
+        return None if len(times) and np.isnan(times[0]) else times.tolist()
+
+    def winner(self):
+        # 0, 1 or 2 for a draw per game
+        d0, d1 = self.header["discs0"], self.header["discs1"]
+        return np.where(d0 > d1, 0, np.where(d0 < d1, 1, 2)).astype(np.int8)
+
+    def move_matrix(self):
+        # (n, max plies) uint8 moves, padded with PASS
+        n_plies = self.header["n_plies"].astype(np.int64)
+        width = int(n_plies.max()) if len(self) else 0
+        ply = np.arange(width)
+        valid = ply < n_plies[:, None]
+        matrix = np.full((len(self), width), PASS, dtype=np.uint8)
+        matrix[valid] = self.moves[(self.offsets[:, None] + ply)[valid]]
+        return matrix
+
+    def replay(self, openings=None, libc=None):
+        """
+            Every position of every game, all games advanced together one ply at a time.
+            :param openings: BoardArray of start positions for games with an opening index
+            :return: (positions BoardArray, game index, ply) - the position before each move plus the final position of
+                     each game, ordered by game then ply, side to move as player
+        """
+        libc = libc or LibC()
+        n = len(self)
+        n_plies = self.header["n_plies"].astype(np.int64)
+        board = Board(0, 0)
+        libc.board_init(board)
+        player = np.full(n, board.player, dtype=np.uint64)
+        opponent = np.full(n, board.opponent, dtype=np.uint64)
+        opening = self.header["opening"]
+        has_opening = opening != NO_OPENING
+        if np.any(has_opening):
+            if openings is None:
+                raise ValueError("records start from openings, pass the opening set")
+            player[has_opening] = openings.player[opening[has_opening]]
+            opponent[has_opening] = openings.opponent[opening[has_opening]]
+
+        starts = np.zeros(n, dtype=np.int64)
+        np.cumsum(n_plies[:-1] + 1, out=starts[1:])
+        positions = BoardArray.empty(int(n_plies.sum()) + n)
+        game = np.repeat(np.arange(n, dtype=np.int64), n_plies + 1)
+        ply = (np.arange(len(positions), dtype=np.int64) - starts[game]).astype(np.int16)
+
+        matrix = self.move_matrix().astype(np.int32)
+        for t in range(matrix.shape[1] + 1):
+            # games still being replayed at ply t, including the one reaching its final position
+            active = np.flatnonzero(n_plies >= t)
+            positions.data["player"][starts[active] + t] = player[active]
+            positions.data["opponent"][starts[active] + t] = opponent[active]
+            moving = active[n_plies[active] > t]
+            if len(moving) == 0:
+                break
+            next_player, next_opponent = libc.board_update_batch(player[moving], opponent[moving], matrix[moving, t])
+            player[moving], opponent[moving] = next_player, next_opponent
+        return positions, game, ply
@@ -5,75 +5,158 @@ from players.player import RandomPlayer
 from players.edax_player import EdaxPlayer
 from players.edax_player_solve import EdaxPlayerSolve
 import time
-from multiprocessing import Process, Array
+from gamerecord import GameRecordWriter, NO_OPENING
+from observers import BoardPrinter, RecordObserver, bind
+from clock import Clock
+from openings import opening_game, seats, unseat, load as load_openings
 
-def playGame(players, wincount):
-    libc = LibC()
+def build_players(players):
+    # Players are passed in tuples ({class_name}, {name}, *{initialization_vars}) so that they can be pickled
+    return [globals()[spec[0]](*spec[1:]) for spec in players]
+
+def game_plies(players, libc=None, observers=(), start=None, opening=NO_OPENING, clocks=None):
+    """
+        The game loop of play as a generator, for drivers that get the moves themselves (play, asyncedax.play_async):
+        yields (index of the player to move, board, legal moves) and takes the move back through send.
+        The parameters are those of play, the result of play is the value of the StopIteration.
+    """
+    if libc is None:
+        libc = LibC()
     board = Board(0,0)
-    libc.board_init(board)
-    libc.board_print(board)
-    moves = libc.get_moves(board.player, board.opponent)
-    print(board.player)
-    print(board.opponent)
-    tmp = []
-    for player, name in players:
-        tmp.append(globals()[player](name))
-    players = tmp
+    if start is None:
+        libc.board_init(board)
+    else:
+        board.player, board.opponent = start.player, start.opponent
+    for player in players:
+        player.new_game(board)
+    if clocks is not None:
+        for clock in clocks:
+            clock.reset()
+    hooks = bind(observers) if observers else None
+    if hooks:
+        for hook in hooks["on_game_start"]:
+            hook(players, board, opening)
+    # players following the game move by move (players/player.py protocol)
+    notify = [player.notify_move for player in players if hasattr(player, "notify_move")]
 
-    # main loop
+    # main loop, one turn_state per ply gives the moves, pass/game over and disc counts
     current_player = 0
-    while not libc.board_is_game_over(board):
+    state = libc.turn_state(board)
+    while not state.game_over:
         # get move from current player, could be a pass
-        move = players[current_player].get_move(board)
+        if clocks is None:
+            move = yield current_player, board, state.moves
+        else:
+            clock = clocks[current_player]
+            if hasattr(players[current_player], "set_move_time"):
+                players[current_player].set_move_time(clock.allot(64 - state.player_count - state.opponent_count))
+            clock.start()
+            move = yield current_player, board, state.moves
+            elapsed = clock.stop()
+            if hooks:
+                for hook in hooks["on_clock"]:
+                    hook(current_player, elapsed, clock.remaining)
 
         # update board, not using OOP bc edax is in C
         if move == -1:
             libc.board_swap_players(board)
         else:
             libc.board_update(board, move, board) # this implicitly swaps the player, might not be wanted
+        for notify_move in notify:
+            notify_move(move)
+        if hooks:
+            if move == -1:
+                for hook in hooks["on_pass"]:
+                    hook(board, current_player)
+            else:
+                for hook in hooks["on_move"]:
+                    hook(board, move, current_player)
 
         # update current_player
         current_player = 1 - current_player
-        libc.board_print(board, player_color=current_player)
+        libc.turn_state(board, state)
 
-    # These should be put to analyze and become optional
     cnts = [0,0]
-    player_cnt = libc.bit_count(board.player)
-    opponent_cnt = libc.bit_count(board.opponent)
-    cnts[current_player] = player_cnt
-    cnts[1-current_player] = opponent_cnt
+    cnts[current_player] = state.player_count
+    cnts[1-current_player] = state.opponent_count
     winner = 0
     if cnts[winner] == cnts[1-winner]:
-        wincount[2] += 1
-        print("draw!!")
-        return cnts, 2
-    if cnts[winner] < cnts[1-winner]:
+        winner = 2
+    elif cnts[winner] < cnts[1-winner]:
         winner = 1-winner
-    print(players[winner].name + " wins!!")
-    wincount[winner] += 1
+    if hooks:
+        for hook in hooks["on_game_end"]:
+            hook(players, board, cnts, winner)
+    return cnts, winner
+
+def play(players, libc=None, observers=(), start=None, opening=NO_OPENING, clocks=None):
+    """
+        Play one game between two player objects, players[0] moves first.
+        :param players: player objects
+        :param libc: LibC to reuse
+        :param observers: game observers (observers.py), eg. BoardPrinter to print the game. None is silent
+        :param start: start position (Board / Position, side to move as player), initial board if None
+        :param opening: index of start in its opening suite, passed to observers
+        :param clocks: clock.Clock per player, reset here. Players with set_move_time get their time for each move.
+                       Players with notify_move get every move once it is played
+        :return: (disc counts per player, winner) winner is 0, 1 or 2 for a draw
+    """
+    game = game_plies(players, libc, observers, start, opening, clocks)
+    try:
+        current_player, board, moves = next(game)
+        while True:
+            current_player, board, moves = game.send(players[current_player].get_move(board, moves=moves))
+    except StopIteration as end:
+        return end.value
+
+def play_opening(players, openings, game_id, libc=None, observers=(), clocks=None):
+    """
+        Game game_id of an opening suite match (see openings.py): the opening game_id // 2, colors swapped on odd ids.
+        :param openings: BoardArray of start positions
+        :param clocks: clock per player, they change seats with the players
+        :return: (disc counts, winner) indexed like players, whichever moved first
+    """
+    opening, swapped = opening_game(game_id)
+    cnts, winner = play(seats(players, swapped), libc, observers, openings[opening], opening, seats(clocks, swapped))
+    return unseat(cnts, winner, swapped)
+
+def playGame(players, wincount, record_file=None, openings=None, game_id=0, verbose=True, time_control=None):
+    # record_file: game record file to append the game to, see gamerecord.py
+    # openings: opening suite file or BoardArray, game_id picks the opening and colors (openings.opening_game)
+    # verbose: print the board after every move and the result
+    # time_control: "budget+increment" seconds per player and game, eg. "60+0.5" (clock.py)
+    libc = LibC()
+    clocks = [Clock(time_control), Clock(time_control)] if time_control is not None else None
+    observers = [BoardPrinter(libc)] if verbose else []
+    record = GameRecordWriter(record_file, chunk_size=1) if record_file is not None else None
+    if record is not None:
+        observers.append(RecordObserver(record))
+    players = build_players(players)
+    if openings is None:
+        cnts, winner = play(players, libc, observers, clocks=clocks)
+    else:
+        if isinstance(openings, str):
+            openings = load_openings(openings)
+        cnts, winner = play_opening(players, openings, game_id, libc, observers, clocks)
+    if record is not None:
+        record.close()
+    for player in players:
+        # engines go back to their pool, warm for the next game
+        if hasattr(player, "close"):
+            player.close()
+    # wincount may be a multiprocessing Array shared by concurrent games: an unlocked += loses updates
+    if hasattr(wincount, "get_lock"):
+        with wincount.get_lock():
+            wincount[winner] += 1
+    else:
+        wincount[winner] += 1
     return cnts, winner
 
 if __name__ == '__main__':
-    start = time.time()
-    win_cnt = Array('i', [0,0,0])
+    from tournament import run_tournament
     total_games = 1
     # Pass players in tuples ({class_name}, [{initialization_vars}]) so that they can be pickled
     players = [("EdaxPlayer", "edax player fe"), ("EdaxPlayerSolve", "edax solve player zx")]
 
-    processes = []
-    for i in range(total_games):
-        p = Process(target=playGame, args=[players, win_cnt])
-        processes.append(p)
-        p.start()
-        # _, winner = playGame(players)
-        # win_cnt[winner] += 1
-    for p in processes:
-        p.join()
-
-    print('{} wins {}/{} games!'.format(players[0][1], win_cnt[0], total_games))
-    print('{} wins {}/{} games!'.format(players[1][1], win_cnt[1], total_games))
-    print('Draw {}/{} games!'.format(win_cnt[2], total_games))
-    end = time.time()
-    print(f"Time: {end - start:.6f} seconds")
-
-
+    # a fixed pool of workers reuses players and LibC across games, results are counted in this process only
+    print(run_tournament(players, total_games).summary())
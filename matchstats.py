@@ -0,0 +1,126 @@
+import math
+from statistics import NormalDist
+
+'''
+    Match statistics - Elo difference with a confidence interval and a sequential probability ratio test (SPRT), from
+    the point of view of player 0 (score 1 win, 0.5 draw, 0 loss).
+    Independent games are counted as a trinomial (wins, draws, losses). Games played as color-swapped pairs of the same
+    opening (openings.py) are counted as a pentanomial over the pair score 0, 0.5, 1, 1.5, 2: the two games of a pair
+    are correlated through the opening, and treating them as independent would understate the variance.
+    The SPRT uses the normal approximation of the log-likelihood ratio (as in fishtest): it accepts H0 (Elo <= elo0) or
+    H1 (Elo >= elo1) as soon as the evidence is strong enough at error rates alpha / beta.
+'''
+
+def elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def score_to_elo(score):
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+class MatchStats:
+
+    '''
+        paired - games 2k and 2k + 1 are the two colors of one opening
+        wdl - [wins, draws, losses] of player 0
+        pentanomial - number of pairs with player 0 pair score 0, 0.5, 1, 1.5, 2
+    '''
+    def __init__(self, paired=False):
+        self.paired = paired
+        self.wdl = [0, 0, 0]
+        self.pentanomial = [0] * 5
+        self.half_pairs = {} # opening -> score of the first finished game of its pair
+
+    def add(self, game_id, score):
+        """
+            :param game_id: game index, pairs are (2k, 2k + 1) when paired
+            :param score: player 0 score of the game, 1, 0.5 or 0
+        """
+        self.wdl[{1: 0, 0.5: 1, 0: 2}[score]] += 1
+        if self.paired:
+            other = self.half_pairs.pop(game_id // 2, None)
+            if other is None:
+                self.half_pairs[game_id // 2] = score
+            else:
+                self.pentanomial[int(2 * (score + other))] += 1
+
+    @property
+    def games(self):
+        return sum(self.wdl)
+
+    def _samples(self):
+        # (number of samples, [(score per game, probability)]) of the unit the variance is measured on
+        if self.paired:
+            n = sum(self.pentanomial)
+            return n, [(k / 4, c / n) for k, c in enumerate(self.pentanomial)] if n else []
+        n = self.games
+        return n, [(s, c / n) for s, c in zip((1, 0.5, 0), self.wdl)] if n else []
+
+    def mean_variance(self):
+        # mean score per game and the variance of one sample (a game, or a pair averaged over its two games)
+        n, dist = self._samples()
+        if n == 0:
+            return 0.5, 0.0, 0
+        mean = sum(s * p for s, p in dist)
+        return mean, sum(p * (s - mean) ** 2 for s, p in dist), n
+
+    def score(self):
+        wins, draws, losses = self.wdl
+        return (wins + draws / 2) / max(self.games, 1)
+
+    def elo(self, confidence=0.95):
+        """
+            :return: (elo, lower, upper) Elo difference of player 0 and its confidence interval
+        """
+        mean, variance, n = self.mean_variance()
+        if n == 0:
+            return 0.0, -math.inf, math.inf
+        margin = NormalDist().inv_cdf((1 + confidence) / 2) * math.sqrt(variance / n)
+        return score_to_elo(mean), score_to_elo(mean - margin), score_to_elo(mean + margin)
+
+    def llr(self, elo0, elo1):
+        # log-likelihood ratio of H1 (elo1) against H0 (elo0)
+        mean, variance, n = self.mean_variance()
+        if n == 0 or variance == 0:
+            return 0.0
+        s0, s1 = elo_to_score(elo0), elo_to_score(elo1)
+        return n * (s1 - s0) * (2 * mean - s0 - s1) / (2 * variance)
+
+    def summary(self):
+        elo, lower, upper = self.elo()
+        lines = ["W/D/L {}/{}/{}, score {:.3f}, Elo {:.1f} [{:.1f}, {:.1f}]".format(*self.wdl, self.score(), elo, lower,
+                                                                                upper)]
+        if self.paired:
+            lines.append("pentanomial (0, 0.5, 1, 1.5, 2): {}".format(self.pentanomial))
+        return "\n".join(lines)
+
+class SPRT:
+
+    '''
+        elo0, elo1 - Elo of player 0 under H0 and H1
+        alpha - probability of accepting H1 when H0 holds, beta - of accepting H0 when H1 holds
+    '''
+    def __init__(self, elo0=0, elo1=5, alpha=0.05, beta=0.05):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+
+    def status(self, stats):
+        """
+            :param stats: MatchStats
+            :return: "H0", "H1" or None to keep playing
+        """
+        llr = stats.llr(self.elo0, self.elo1)
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def __repr__(self):
+        return "SPRT(elo0={}, elo1={}, llr bounds [{:.3f}, {:.3f}])".format(self.elo0, self.elo1, self.lower,
+                                                                             self.upper)
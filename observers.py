@@ -0,0 +1,127 @@
+import sys
+import time
+
+from gamerecord import NO_OPENING
+
+'''
+    Game observers - optional hooks of the game loop (maingame.play). The loop calls them only when observers are
+    attached, so a silent game pays nothing for printing, record writing or metrics.
+    An observer implements any of:
+        on_game_start(players, board, opening) - opening index of the start position, NO_OPENING for the initial board
+        on_move(board, move, player_index) - board is after the move, players swapped
+        on_pass(board, player_index)
+        on_clock(player_index, elapsed, remaining) - games with clocks, before on_move / on_pass of the same ply,
+                                                     remaining is None without budget
+        on_game_end(players, board, cnts, winner) - winner 0, 1 or 2 for a draw
+    Missing hooks are skipped; play() looks them up once per game, not per move.
+'''
+
+HOOKS = ("on_game_start", "on_move", "on_pass", "on_clock", "on_game_end")
+
+def bind(observers):
+    # hook name -> list of bound methods of the observers implementing it
+    return {hook: [getattr(o, hook) for o in observers if hasattr(o, hook)] for hook in HOOKS}
+
+class BoardPrinter:
+
+    '''
+        The output of the original game loop: board_print after every move (stderr) and the winner (stdout).
+    '''
+    def __init__(self, libc):
+        self.libc = libc
+
+    def on_game_start(self, players, board, opening):
+        self.libc.board_print(board)
+        print(board.player)
+        print(board.opponent)
+
+    def on_move(self, board, move, player_index):
+        # the opponent of player_index is to move
+        self.libc.board_print(board, player_color=1 - player_index)
+
+    def on_pass(self, board, player_index):
+        self.libc.board_print(board, player_color=1 - player_index)
+
+    def on_game_end(self, players, board, cnts, winner):
+        if winner == 2:
+            print("draw!!")
+        else:
+            print(players[winner].name + " wins!!")
+
+class RecordObserver:
+
+    '''
+        Appends every game to a gamerecord.GameRecordWriter, with the time of every move when the game has clocks.
+    '''
+    def __init__(self, writer):
+        self.writer = writer
+        self.opening = NO_OPENING
+        self.moves = []
+        self.times = []
+
+    def on_game_start(self, players, board, opening):
+        self.moves = []
+        self.times = []
+        self.opening = opening
+
+    def on_move(self, board, move, player_index):
+        self.moves.append(move)
+
+    def on_pass(self, board, player_index):
+        self.moves.append(-1)
+
+    def on_clock(self, player_index, elapsed, remaining):
+        self.times.append(elapsed)
+
+    def on_game_end(self, players, board, cnts, winner):
+        self.writer.add(players, self.moves, cnts, self.opening, self.times or None)
+
+class GameMetrics:
+
+    '''
+        Counts games, plies, passes and time spent in games, eg. for games/s of a run. With clocks, also the thinking
+        time and time losses (budget exceeded) of each player by name.
+    '''
+    def __init__(self):
+        self.games = 0
+        self.plies = 0
+        self.passes = 0
+        self.time = 0.0
+        self.think_time = {} # name -> [seconds, moves]
+        self.flagged = {} # name -> games over budget
+        self._start = None
+        self._names = None
+        self._flagged = set()
+
+    def on_game_start(self, players, board, opening):
+        self._start = time.perf_counter()
+        self._names = [p.name for p in players]
+        self._flagged = set()
+
+    def on_clock(self, player_index, elapsed, remaining):
+        think_time = self.think_time.setdefault(self._names[player_index], [0.0, 0])
+        think_time[0] += elapsed
+        think_time[1] += 1
+        if remaining is not None and remaining < 0:
+            self._flagged.add(self._names[player_index])
+
+    def on_move(self, board, move, player_index):
+        self.plies += 1
+
+    def on_pass(self, board, player_index):
+        self.plies += 1
+        self.passes += 1
+
+    def on_game_end(self, players, board, cnts, winner):
+        self.games += 1
+        self.time += time.perf_counter() - self._start
+        for name in self._flagged:
+            self.flagged[name] = self.flagged.get(name, 0) + 1
+
+    def report(self, file=sys.stdout):
+        print("{} games, {} plies ({} passes), {:.2f} games/s, {:.0f} plies/s".format(
+            self.games, self.plies, self.passes, self.games / max(self.time, 1e-9), self.plies / max(self.time, 1e-9)),
+            file=file)
+        for name, (seconds, moves) in self.think_time.items():
+            print("{}: {:.3f}s per move, {} games over budget".format(name, seconds / max(moves, 1),
+                                                                    self.flagged.get(name, 0)), file=file)
@@ -0,0 +1,70 @@
+import sys
+import numpy as np
+
+from boardarray import BoardArray
+from players.player import RandomPlayer
+from symmetry import unique_boards
+from vectorgame import VectorGame
+
+'''
+    Opening suites - start positions for matches, stored as a BoardArray .npy (memory-mapped on load) with the side to
+    move as player. Every opening is played twice with colors swapped: game_id 2k plays opening k with players[0] to
+    move, game_id 2k + 1 the same opening with players[1] to move, so neither player profits from a lopsided opening.
+'''
+
+def load(filename, mmap=True):
+    # .npy suite (mmap) or an OBF text file
+    if filename.endswith(".npy"):
+        return BoardArray.load(filename, mmap=mmap)
+    return BoardArray.load_obf(filename)
+
+def opening_game(game_id):
+    # game_id -> (opening index, colors swapped)
+    return game_id // 2, game_id % 2 == 1
+
+def seats(items, swapped):
+    # players (or their clocks, None stays None) in seat order of a game, the first one moves first
+    return items[::-1] if swapped and items is not None else items
+
+def unseat(cnts, winner, swapped):
+    # (disc counts, winner) of a game played in seats order, back in the order of the players
+    if swapped:
+        return cnts[::-1], winner if winner == 2 else 1 - winner
+    return cnts, winner
+
+def generate(n, n_plies, seed=None, batch_size=None):
+    """
+        Random n_plies-ply openings, deduplicated up to symmetry (positions are stored canonical).
+        Positions where the game is over or the side to move has to pass are dropped.
+        :param n: number of openings
+        :param n_plies: random plies played from the initial board
+        :param seed: seed of the random playouts
+        :param batch_size: games played together per round, defaults to 2n
+        :return: BoardArray of n openings, fewer if the ply has fewer distinct positions
+    """
+    rng = np.random.default_rng(seed)
+    players = [RandomPlayer("opening generator"), RandomPlayer("opening generator")]
+    for player in players:
+        player.rng = rng
+    batch_size = batch_size or 2 * n
+    suite = BoardArray.empty(0)
+    found = -1
+    # stop once a round adds nothing new, small plies have few distinct positions
+    while len(suite) < n and len(suite) > found:
+        found = len(suite)
+        game = VectorGame(players, batch_size)
+        for _ in range(n_plies):
+            game.step()
+        boards = BoardArray.from_bitboards(game.player[~game.over], game.opponent[~game.over])
+        boards = boards[boards.moves() != 0]
+        suite, _, _ = unique_boards(BoardArray.concatenate([suite, boards]))
+    # unique_boards sorts, shuffle so a prefix of the suite is a random sample
+    return suite[rng.permutation(len(suite))[:n]]
+
+if __name__ == '__main__':
+    # usage: python openings.py n_openings n_plies output.npy [seed]
+    n, n_plies, filename = int(sys.argv[1]), int(sys.argv[2]), sys.argv[3]
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    suite = generate(n, n_plies, seed)
+    suite.save(filename)
+    print("{} openings of {} plies saved to {}".format(len(suite), n_plies, filename))
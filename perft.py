@@ -0,0 +1,61 @@
+import ctypes
+import os
+import time
+from multiprocessing import Pool
+
+from clib import Board, LibC, board_ref, get_lib
+from position import Position
+
+'''
+    Perft - number of moves (passes included) playable at a given ply, computed by edax perft.c (count_moves).
+    Same numbers as the "moves" column of `mEdax -count games N`; from the initial board: 4, 12, 56, 244, 1396, 8200,
+    55092, 390216, 3005288, ...
+'''
+
+PARALLEL_MIN_DEPTH = 10 # below this a process pool costs more than it saves
+
+def _count_moves(args):
+    player, opponent, depth = args
+    return get_lib().count_moves(ctypes.byref(Board(player, opponent)), depth)
+
+def root_children(board):
+    """
+        Positions after each root move, following count_game: a forced pass is one child, a finished game has none.
+        :return: list of Position
+    """
+    libc = LibC()
+    moves = libc.get_moves(board.player, board.opponent)
+    if moves == 0:
+        if libc.get_moves(board.opponent, board.player) == 0:
+            return []
+        return [Position(board.opponent, board.player)]
+    children = []
+    next = Board(0, 0)
+    while moves:
+        x = (moves & -moves).bit_length() - 1
+        moves &= moves - 1
+        libc.board_update(board, x, next)
+        children.append(Position.from_board(next))
+    return children
+
+def perft(board, depth, parallel=True, processes=None):
+    """
+        :param board: utils.Board or position.Position
+        :param depth: ply to count moves at
+        :param parallel: split the root moves over a process pool (only from PARALLEL_MIN_DEPTH on)
+        :param processes: pool size, defaults to cpu count
+        :return: move count at ply depth
+    """
+    if not parallel or depth < PARALLEL_MIN_DEPTH:
+        return get_lib().count_moves(board_ref(board), depth)
+    children = root_children(board)
+    with Pool(processes=min(processes or os.cpu_count() or 1, max(len(children), 1))) as pool:
+        return sum(pool.map(_count_moves, [(c.player, c.opponent, depth - 1) for c in children]))
+
+if __name__ == '__main__':
+    board = Board(0, 0)
+    LibC().board_init(board)
+    for depth in range(1, 10):
+        start = time.time()
+        n = perft(board, depth)
+        print(f"perft({depth}) = {n}, {time.time() - start:.6f} seconds")
@@ -1,9 +1,10 @@
 import copy
 import random
-import subprocess
 import utils
 import sys
 import re
+from players.edax_player_solve import bitboards_to_obf
+from players.edax_pool import NBoardEngine, get_pool
 
 '''
     board - struct of two uint64, player and opponent
@@ -97,88 +98,94 @@ class EdaxPlayer:
     '''
         Options (see edax doc for ref):
         -l: level
+        The mEdax process comes warm from players.edax_pool and speaks NBoard (NBoardEngine): the player keeps it across
+        games, sends it the moves played since its last search together with `go` and reads back one reply per move.
+        The engine goes back to the pool on close.
+        Moves come from notify_move (players/player.py protocol). A driver that does not notify them (eg. vectorgame)
+        still gets moves for its board: get_move checks board against the notified moves and otherwise restarts the
+        engine game from board.
+        history - moves of the game, -1 for a pass
+        board - position after the notified moves
+        last_result - reply to the last search: move, score, depth, accuracy, nodes and time (ms)
     '''
     def __init__(self, name, *args):
         self.libc = utils.LibC()
         self.name = name
-        self.process = None # Will be initiated during the first call to get_move, depending on the color of this player
-        self.first_move = False
-        self.board = utils.Board(0,0)
-        self.libc.board_init(self.board)
-        self.last_edax_move = None
+        self.engine = None # acquired from the pool by the first get_move
+        self.pool = get_pool()
+        self.history = []
+        self.sent = 0 # moves of history played in the engine game
+        initial = utils.Board(0,0)
+        self.libc.board_init(initial)
+        self.board = utils.Position.from_board(initial)
+        self.setboard = None
+        self.move_time = None
+        self.last_result = None
         self.options = list(args)
         if name == "edax player fe":
             self.options = ['-l', '30', '-game-file', 'gamefile.txt', '-search-log-file', 'searchlog.txt']
         if name == "edax player zx":
             self.options = ['-l', '8']
 
-    def read_edax_move(self):
-        edax_move = -1
-        line = self.process.stdout.readline()
-        cnt = 0
-        edax_played = False
-        while line:
-            cnt += 1
-            line_string = line.decode('utf-8')
-            # print(cnt, '\t', line_string, end='')
-            # Edax will hang up waiting for user input after 12 lines of standard output
-            if "Edax plays" in line_string:
-                edax_move_coords = line_string.split(" ")[2][:-1]
-                edax_move = coordToMove(edax_move_coords)
-                self.last_edax_move = edax_move
-                # print("edax_move: ", edax_move, file=sys.stderr)
-                cnt = 0
-                edax_played = True
-            if cnt == 12 and edax_played:
-                break
-            line = self.process.stdout.readline()
-        return edax_move
-
-    def send_opponent_move(self, opponent_move):
-        if opponent_move == -1:
-            opponent_move_coords = "ps"
+    # reset for a new game from board (initial board if None), the engine is reset now and replaced if unhealthy
+    def new_game(self, board=None):
+        initial = utils.Board(0,0)
+        self.libc.board_init(initial)
+        self.setboard = None
+        self.board = utils.Position.from_board(initial)
+        if board is not None and not board == initial:
+            self.setboard = bitboards_to_obf(board.player, board.opponent)
+            self.board = utils.Position.from_board(board)
+        self.history = []
+        self.sent = 0
+        self.move_time = None
+        self.last_result = None
+        if self.engine is not None and not self.engine.new_game(self.setboard):
+            self.pool.restarts += 1
+            self.engine.kill()
+            self.engine = None
+
+    # seconds for the next move (game clock), the -l level still caps the depth. See clock.MIN_MOVE_TIME
+    def set_move_time(self, seconds):
+        self.move_time = seconds
+
+    # the engine goes back to the pool, warm for the next player with the same options
+    def close(self):
+        if self.engine is not None:
+            self.pool.release(self.engine)
+            self.engine = None
+
+    # a move of either player, sent to the engine with the next search
+    def notify_move(self, move):
+        self.history.append(move)
+        if move == -1:
+            self.board = self.board.swap()
         else:
-            opponent_move_coords = moveToCoord(opponent_move)
-        # print("opponent move coords:", opponent_move_coords)
-        self.process.stdin.write(opponent_move_coords.encode('utf-8') + b'\n')
-        self.process.stdin.flush()
-
-    def get_move(self, board):
-        if self.process is None:
-            if board == self.board:
-                self.process = subprocess.Popen(['./bin/mEdax', '-mode', '1'] + self.options, stdin=subprocess.PIPE,
-                                                stdout=subprocess.PIPE,
-                                                stderr=subprocess.STDOUT)
-                self.first_move = True
-            else:
-                self.process = subprocess.Popen(['./bin/mEdax', '-mode', '0'] + self.options, stdin=subprocess.PIPE,
-                                                stdout=subprocess.PIPE,
-                                                stderr=subprocess.STDOUT)
-        if self.first_move:
-            edax_move = self.read_edax_move()
-            self.first_move = False
+            next = utils.Board(0,0)
+            self.libc.board_update(self.board, move, next)
+            self.board = utils.Position.from_board(next)
+
+    def get_move(self, board, moves=None):
+        if self.engine is None:
+            self.engine = self.pool.acquire(self.options, self.setboard, NBoardEngine)
+        position = utils.Position.from_board(board)
+        if position == self.board:
+            for move in self.history[self.sent:]:
+                self.engine.play(move)
         else:
-            # compute the other player move and send it to edax
-            opponent_move = -1
-            combined_moves = (board.opponent|board.player) - (self.board.opponent|self.board.player)
-            # print("opponent move: {0:x}".format((board.opponent|board.player) - (
-            #         self.board.opponent|self.board.player)))
-            moves_list = []
-            for i in range(64):
-                if (combined_moves >> i) % 2 == 1:
-                    moves_list.append(i)
-            for move in moves_list:
-                if move == self.last_edax_move:
-                    continue
-                opponent_move = move
-
-            # send the move to edax engine
-            self.send_opponent_move(opponent_move)
-
-            # read edax move
-            edax_move = self.read_edax_move()
-        self.board = copy.deepcopy(board)
-        return edax_move
+            # moves missing from notify_move: the unsent history does not lead to board, search board itself
+            self.engine.set_position(bitboards_to_obf(board.player, board.opponent))
+            self.board = position
+        self.sent = len(self.history)
+        if moves is None:
+            moves = self.libc.get_moves(board.player, board.opponent)
+        if moves == 0:
+            # forced pass, no search
+            return -1
+        if self.move_time is not None:
+            self.engine.set_move_time(self.move_time)
+        self.last_result = self.engine.go()
+        return self.last_result["move"]
 
 if __name__ == '__main__':
     # print('{}'.format(coordToMove('a1')))
@@ -4,6 +4,10 @@ import subprocess
 import utils
 import sys
 import re
+import edaxengine
+import searchcache
+import solveserver
+from edaxengine import option_level
 
 '''
     board - struct of two uint64, player and opponent
@@ -115,14 +119,17 @@ def scorestr2range(s):
     score = int(s)
     return (score, score)
 
-def compute_one_verbose2_problem(lines):
+# verbose: print the lines while parsing
+def compute_one_verbose2_problem(lines, verbose=False):
+    # a ? before the score marks an iteration cut short by the time limit (-move-time)
 
     lines.reverse()
 
     for x in lines:
-        print(x)
+        if verbose:
+            print(x)
         m = re.search(
-            r"([0-9]+)\s+([><]?[-+][0-9]{2})\s+([0-9.:]+)\s+([0-9]+)\s+([0-9]*)\s+(([a-hA-H][1-8]\s?)+)",
+            r"([0-9]+)\s+\??([><]?[-+][0-9]{2})\s+([0-9.:]+)\s+([0-9]+)\s+([0-9]*)\s+(([a-hA-H][1-8]\s?)+)",
             x,
         )
         if m is not None:
@@ -141,7 +148,7 @@ def compute_one_verbose2_problem(lines):
             }
 
         m = re.search(
-            r"([0-9]+)@([0-9]+)%\s+([-+][0-9]{2})\s+([0-9.:]+)\s+([0-9]+)\s+([0-9]*)\s+(([a-hA-H][1-8]\s?)+)",
+            r"([0-9]+)@([0-9]+)%\s+\??([-+][0-9]{2})\s+([0-9.:]+)\s+([0-9]+)\s+([0-9]*)\s+(([a-hA-H][1-8]\s?)+)",
             x,
         )
         if m is not None:
@@ -168,8 +175,12 @@ class EdaxPlayerSolve:
     '''
         Options (see edax doc for ref):
         -l: level
+        use_engine: search in-process with a persistent edaxengine.EdaxEngine instead of the mEdax solve server
+                    (solveserver.py)
+        verbose: print the search result of every move
+        Results of searches without a move time are looked up in and added to searchcache.get_cache().
     '''
-    def __init__(self, name, *args):
+    def __init__(self, name, *args, use_engine=False, verbose=False):
         self.libc = utils.LibC()
         self.name = name
         # self.process = None # Will be initiated during the first call to get_move, depending on the color of this player
@@ -182,30 +193,49 @@ class EdaxPlayerSolve:
         #     self.options = ['-l', '11', '-game-file', 'gamefile.txt', '-search-log-file', 'searchlog.txt']
         # if name == "edax player zx":
         #     self.options = ['-l', '8']
-
-    def get_move(self, board):
-        problem = bitboards_to_obf(board.player, board.opponent)
-        with open("tmp_obf_file", "w") as f:
-            f.write(problem)
-            f.close
-        proc = subprocess.Popen(
-            ['./bin/mEdax', '-solve', "tmp_obf_file"] + self.options,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-        )
-        result_stdout = []
-        while True:
-            line = proc.stdout.readline()
-            if not line and proc.poll() is not None:
-                break
-            if line:
-                result_stdout.append(line.rstrip())
-
-        analyze = compute_one_verbose2_problem(result_stdout)
-        print(analyze)
-        return coordToMove(analyze["principal_variation"][0])
+        self.engine = edaxengine.EdaxEngine(level=option_level(self.options)) if use_engine else None
+        # cache entries are shared only with searches of the same engine and options
+        if self.engine is not None:
+            self.cache_engine = searchcache.engine_id(searchcache.IN_PROCESS, ["-h", str(self.engine.hash_size),
+                                                                               "-n", str(self.engine.n_tasks)])
+        else:
+            self.cache_engine = searchcache.engine_id(searchcache.MEDAX, solveserver.get_server(self.options).options)
+        self.verbose = verbose
+        self.move_time = None
+
+    # the engine hash table is kept warm across games
+    def new_game(self, board=None):
+        self.move_time = None
+
+    # seconds for the next move (game clock), the -l level still caps the depth. See clock.MIN_MOVE_TIME
+    def set_move_time(self, seconds):
+        self.move_time = seconds
+
+    def close(self):
+        if self.engine is not None:
+            self.engine.close()
+            self.engine = None
+
+    # batched get_move (vectorgame.py): every position is searched in-process by edaxengine.solve_batch
+    def get_moves(self, player, opponent, moves=None):
+        return edaxengine.solve_batch(player, opponent, option_level(self.options))[2]
+
+    # moves (legal moves from the game loop) is not needed, edax generates its own
+    def get_move(self, board, moves=None):
+        # searches by level only are reproducible, their results go through the process search cache (if any)
+        cache = searchcache.get_cache() if self.move_time is None else None
+        analyze = cache.get(board, option_level(self.options), self.cache_engine) if cache is not None else None
+        if analyze is None:
+            if self.engine is not None:
+                analyze = self.engine.search(board, move_time=self.move_time)
+            else:
+                # the process-wide solve server of these options, shared by every game and thread of the process
+                analyze = solveserver.get_server(self.options).solve(board, move_time=self.move_time)
+            if cache is not None:
+                cache.put(board, option_level(self.options), self.cache_engine, analyze)
+        if self.verbose:
+            print(analyze)
+        return analyze["move"]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,302 @@
+import os
+import select
+import subprocess
+import time
+from multiprocessing import util
+
+from edaxengine import option_level
+
+'''
+    Warm mEdax processes shared by the EdaxPlayer games of a process. Starting mEdax (process, eval weights, hash table
+    allocation) costs more than a whole game at a low level, so engines are kept alive per option set and reset between
+    games with the new-game commands (console init / setboard, NBoard game) instead of being restarted.
+    An engine taken from the pool is health-checked first (a `version` or `ping` round trip, which also drains output
+    left from its previous game) and replaced if it crashed or hangs. Idle engines are shut down when the process exits.
+    NBoardEngine drives mEdax through the NBoard protocol (edax_src/nboard.c) instead of the console: the position and
+    moves are sent as commands, `go` answers with one fixed reply carrying move, score, depth and nodes.
+'''
+
+EDAX_BIN = "./bin/mEdax"
+SYNC_TIMEOUT = 10.0 # seconds an idle engine may take to answer the health check
+CLOSE_TIMEOUT = 5.0
+SYNC_MARKER = "Edax version"
+INITIAL_OBF = "---------------------------OX------XO--------------------------- X;"
+NBOARD_END = "status Edax is waiting" # last line of the reply to go
+
+class EngineError(Exception):
+    pass
+
+class EdaxProcess:
+
+    '''
+        One mEdax in console mode 3 (edax never plays on its own until told its color with `mode`).
+        options - mEdax options, eg. ['-l', '10']
+        timed - a move time was set, new_game goes back to searching by level
+    '''
+    def __init__(self, options=(), binary=EDAX_BIN):
+        self.options = list(options)
+        self.binary = binary
+        self.process = None
+        self.buffer = b""
+        self.timed = False
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.process = subprocess.Popen([self.binary, '-mode', '3'] + self.options, stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self.buffer = b""
+        return self
+
+    def send(self, text):
+        try:
+            self.process.stdin.write(text.encode('utf-8'))
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise EngineError("cannot write to mEdax: {}".format(e))
+
+    def readline(self, timeout=None):
+        """
+            :param timeout: seconds to wait for a complete line, None waits forever
+            :return: the next line without its newline, None on timeout
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        fd = self.process.stdout.fileno()
+        while b"\n" not in self.buffer:
+            wait = None if deadline is None else max(deadline - time.time(), 0)
+            if not select.select([fd], [], [], wait)[0]:
+                return None
+            data = os.read(fd, 65536)
+            if not data:
+                raise EngineError("mEdax exited (code {})".format(self.process.poll()))
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line.decode('utf-8', 'replace')
+
+    def read_move(self, timeout=None):
+        # coordinates of the next "Edax plays XX" line, earlier lines (boards, prompts) are skipped
+        while True:
+            line = self.readline(timeout)
+            if line is None:
+                raise EngineError("no move from mEdax within {} s".format(timeout))
+            if "Edax plays" in line:
+                return line.split()[2]
+
+    def sync(self, timeout=SYNC_TIMEOUT):
+        # health check: True once the engine answered `version`, everything printed before is dropped
+        try:
+            self.send("version\n")
+            while True:
+                line = self.readline(timeout)
+                if line is None:
+                    return False
+                if SYNC_MARKER in line:
+                    return True
+        except EngineError:
+            return False
+
+    def set_move_time(self, seconds):
+        # search time of the following moves, see clock.MIN_MOVE_TIME for the minimum on the console
+        self.send("move-time {:.3f}\n".format(seconds))
+        self.timed = True
+
+    def new_game(self, obf=None):
+        """
+            Stop playing (mode 3) and reset to a new game, from obf (side to move plays black) or the initial board.
+            :return: True if the engine is healthy
+        """
+        commands = "mode 3\n" + ("init\n" if obf is None else "setboard {}\n".format(obf))
+        if self.timed:
+            commands += "level {}\n".format(option_level(self.options))
+            self.timed = False
+        try:
+            self.send(commands)
+        except EngineError:
+            return False
+        return self.sync()
+
+    def kill(self):
+        if self.alive:
+            self.process.kill()
+        if self.process is not None:
+            self.process.wait()
+            self.process = None
+
+    def close(self):
+        if not self.alive:
+            self.kill()
+            return
+        try:
+            self.send("quit\n")
+            self.process.wait(CLOSE_TIMEOUT)
+            self.process = None
+        except (EngineError, subprocess.TimeoutExpired):
+            self.kill()
+
+def obf_to_ggf(obf):
+    # GGF game starting from an obf position (X plays black), as read by the NBoard `game` command
+    return "(;GM[Othello]BO[8 {} {}];)".format(obf[:64], "*" if obf[65] == "X" else "O")
+
+def board_to_ggf(board):
+    # GGF game starting from a Board / Position, the side to move (board.player) plays black
+    squares = "".join("*" if (board.player >> i) & 1 else "O" if (board.opponent >> i) & 1 else "-" for i in range(64))
+    return "(;GM[Othello]BO[8 {} *];)".format(squares)
+
+def new_result():
+    return {"depth": None, "accuracy": None, "nodes": None}
+
+def parse_reply_line(line, result):
+    # fills result (new_result) from one line of the NBoard reply to go, other lines are ignored
+    words = line.split()
+    if not words:
+        return
+    if words[0] == "nodestats":
+        result["nodes"] = int(words[1])
+    elif words[:3] == ["status", "Edax", "depth"]:
+        depth, accuracy = words[3].rstrip("%").split("@")
+        result["depth"], result["accuracy"] = int(depth), int(accuracy)
+    elif words[0] == "===":
+        coord = words[1].lower()
+        # pa: pass, --: game over
+        result["move"] = -1 if coord in ("pa", "ps", "--") else (ord(coord[0]) - ord('a')) + 8 * (int(coord[1]) - 1)
+        result["score"] = round(float(words[2]))
+        result["time"] = round(float(words[3]) * 1000)
+
+class NBoardEngine(EdaxProcess):
+
+    '''
+        One mEdax speaking NBoard. The engine keeps the game (and its hash table) between searches: play sends the
+        moves of both sides, go searches the position they lead to. Commands are buffered and go with the next request.
+    '''
+    def __init__(self, options=(), binary=EDAX_BIN):
+        super().__init__(options, binary)
+        self.commands = []
+        self.pings = 0
+
+    def start(self):
+        self.process = subprocess.Popen([self.binary, '-nboard'] + self.options, stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        self.buffer = b""
+        self.commands = []
+        self.send("nboard 1\n")
+        return self
+
+    def request(self, command, end, timeout=None):
+        """
+            Send the buffered commands and command, then read the reply up to its line starting with end.
+            :return: lines of the reply
+        """
+        self.send("".join(self.commands) + command)
+        self.commands = []
+        lines = []
+        while True:
+            line = self.readline(timeout)
+            if line is None:
+                raise EngineError("no reply to {!r} within {} s".format(command.strip(), timeout))
+            if line.startswith("Error:"):
+                # errors go to stderr, merged into the reply
+                raise EngineError("mEdax: {}".format(line[6:].strip()))
+            lines.append(line)
+            if line.startswith(end):
+                return lines
+
+    def sync(self, timeout=SYNC_TIMEOUT):
+        self.pings += 1
+        try:
+            self.request("ping {}\n".format(self.pings), "pong {}".format(self.pings), timeout)
+            return True
+        except EngineError:
+            return False
+
+    def set_move_time(self, seconds):
+        # edax extension of NBoard, like the console command but down to clock.MIN_MOVE_TIME
+        self.commands.append("move-time {:.3f}\n".format(seconds))
+        self.timed = True
+
+    def set_position(self, obf):
+        # new game from obf, the side to move searches next
+        self.commands.append("game {}\n".format(obf_to_ggf(obf)))
+
+    def play(self, move):
+        # move 0..63 or -1 for a pass, played by the side to move
+        self.commands.append("move {}\n".format("pa" if move == -1 else
+                                                 chr(ord('a') + move % 8) + str(1 + move // 8)))
+
+    def go(self, timeout=None):
+        """
+            Search the current position. One round trip: the buffered commands and go are written at once.
+            :return: dict with move (-1 for pass), score, depth, accuracy, nodes and time (ms)
+        """
+        result = new_result()
+        for line in self.request("go\n", NBOARD_END, timeout):
+            parse_reply_line(line, result)
+        if "move" not in result:
+            raise EngineError("reply to go without a move: {}".format(line))
+        return result
+
+    def new_game(self, obf=None):
+        self.commands = []
+        self.set_position(INITIAL_OBF if obf is None else obf)
+        if self.timed:
+            self.commands.append("level {}\n".format(option_level(self.options)))
+            self.timed = False
+        return self.sync()
+
+class EdaxPool:
+
+    '''
+        Idle engines by class and option set. acquire hands out a healthy engine reset to a new game, release takes it
+        back.
+        restarts - engines replaced because they crashed or did not answer
+    '''
+    def __init__(self, binary=EDAX_BIN):
+        self.binary = binary
+        self.idle = {}
+        self.started = 0
+        self.restarts = 0
+
+    def acquire(self, options, obf=None, engine_class=EdaxProcess):
+        """
+            :param options: mEdax options of the engine
+            :param obf: start position of the game, initial board if None
+            :param engine_class: EdaxProcess (console) or NBoardEngine
+            :return: engine_class ready for the game, owned by the caller until release
+        """
+        idle = self.idle.get((engine_class, tuple(options)))
+        while idle:
+            engine = idle.pop()
+            if engine.alive and engine.new_game(obf):
+                return engine
+            self.restarts += 1
+            engine.kill()
+        engine = engine_class(options, self.binary).start()
+        self.started += 1
+        if not engine.new_game(obf):
+            engine.kill()
+            raise EngineError("mEdax {} did not start".format(" ".join(options)))
+        return engine
+
+    def release(self, engine):
+        if engine.alive:
+            self.idle.setdefault((type(engine), tuple(engine.options)), []).append(engine)
+
+    def close(self):
+        for engines in self.idle.values():
+            for engine in engines:
+                engine.close()
+        self.idle = {}
+
+_pool = None
+_pool_pid = None
+
+def get_pool():
+    # the pool of this process, its idle engines are closed at exit. Finalize also runs in multiprocessing workers,
+    # which skip atexit, and a forked child builds its own pool instead of using its parent's engines
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = EdaxPool()
+        _pool_pid = os.getpid()
+        util.Finalize(_pool, _pool.close, exitpriority=10)
+    return _pool
@@ -1,8 +1,10 @@
 import copy
+import numpy as np
 import random
 import subprocess
 import utils
 import sys
+from boardarray import bit_count, squares_to_bits
 
 '''
     board - struct of two uint64, player and opponent
@@ -12,6 +14,16 @@ import sys
             Least significant bit is A1, then B1, ... to H8
     move - 0 indexed integer representing the square to pick the move. Maingame added pass implementation as -1.
 '''
+
+'''
+    Player protocol, as driven by maingame.play:
+    new_game(board) - before every game, board is the start position with the first player to move
+    get_move(board, moves) - move of the side to move (board.player), moves are its legal moves
+    notify_move(move) - optional, every move of the game in order (both players, -1 for a pass) right after it was
+                        played, so stateful players follow the game from the move history instead of diffing boards
+    get_moves(player, opponent, moves) - optional batched get_move over arrays of positions (vectorgame.py)
+    set_move_time(seconds), close() - optional, see maingame.play and playGame
+'''
 # class Player:
 #     # Given a board(player, opponent), return a move
 #     def __init__(self, name, get_move):
@@ -20,26 +32,47 @@ import sys
 #         # func(board) -> move(bitmask)
 #         self.get_move = get_move #decor this by pass checker
 
+def random_moves(moves, rng):
+    """
+        Uniform random legal move of every mask, vectorized.
+        :param moves: uint64 array of legal move masks
+        :param rng: numpy Generator
+        :return: int32 array of squares, -1 where moves is 0
+    """
+    moves = np.asarray(moves, dtype=np.uint64)
+    count = bit_count(moves).astype(np.int32)
+    bits = squares_to_bits(moves)
+    pick = (rng.random(len(moves)) * count).astype(np.int32)
+    # first square where the running count of legal moves exceeds pick
+    chosen = np.argmax(np.cumsum(bits, axis=1, dtype=np.int32) > pick[:, None], axis=1).astype(np.int32)
+    chosen[count == 0] = -1
+    return chosen
+
 # implement a random player
 class RandomPlayer:
     def __init__(self, name):
         self.libc = utils.LibC()
         self.name = name
+        self.rng = np.random.default_rng()
         # func(board) -> move(bitmask)
-    def get_move(self, board):
-        moves = self.libc.get_moves(board.player, board.opponent)
-        moves_list = []
-        for i in range(64):
-            if (moves >> i) % 2 == 1:
-                moves_list.append(i)
-        move_cnt = len(moves_list)
+    # called before every game when the player is reused (tournament workers), nothing to reset
+    def new_game(self, board=None):
+        pass
+    # moves: legal moves if the caller already has them (maingame passes TurnState.moves)
+    def get_move(self, board, moves=None):
+        if moves is None:
+            moves = self.libc.get_moves(board.player, board.opponent)
+        move_cnt = moves.bit_count()
         if move_cnt == 0:
             return -1
-        move_choice = moves_list[random.randint(0, move_cnt-1)]
+        # clear the lowest set bits up to the chosen one instead of listing all 64 squares
+        for _ in range(random.randint(0, move_cnt-1)):
+            moves &= moves - 1
+        move_choice = (moves & -moves).bit_length() - 1
         # print the move just before board update to debug
         # print("move: {}".format(move_choice), file=sys.stderr)
         return move_choice
 
-
-
-
+    # batched get_move for vectorgame.VectorGame: one random legal move per moves mask
+    def get_moves(self, player, opponent, moves):
+        return random_moves(moves, self.rng)
@@ -0,0 +1,111 @@
+import ctypes
+from operator import itemgetter
+
+from clib import Board
+
+'''
+    Position - immutable board value, the hashable counterpart of clib.Board.
+    clib.Board is a ctypes.Structure: mutable, unhashable and expensive to copy.deepcopy. Position is a plain
+    (player, opponent) tuple of python ints, so construction, hashing and equality run in C, copies are free (the value
+    never changes) and positions can be used as dict/cache keys.
+    Symmetries follow edax board_symetry: bit 0 of s mirrors columns (A <-> H), bit 1 mirrors rows (1 <-> 8), bit 2
+    transposes (A1-H8 diagonal), applied in that order.
+'''
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+def horizontal_mirror(b):
+    # exchange columns A - H, B - G, C - F & D - E
+    b = ((b >> 1) & 0x5555555555555555) | ((b << 1) & 0xAAAAAAAAAAAAAAAA)
+    b = ((b >> 2) & 0x3333333333333333) | ((b << 2) & 0xCCCCCCCCCCCCCCCC)
+    b = ((b >> 4) & 0x0F0F0F0F0F0F0F0F) | ((b << 4) & 0xF0F0F0F0F0F0F0F0)
+    return b
+
+def vertical_mirror(b):
+    # exchange rows 1 - 8, 2 - 7, 3 - 6 & 4 - 5
+    return int.from_bytes(b.to_bytes(8, "little"), "big")
+
+def transpose(b):
+    t = (b ^ (b >> 7)) & 0x00AA00AA00AA00AA
+    b = b ^ t ^ (t << 7)
+    t = (b ^ (b >> 14)) & 0x0000CCCC0000CCCC
+    b = b ^ t ^ (t << 14)
+    t = (b ^ (b >> 28)) & 0x00000000F0F0F0F0
+    b = b ^ t ^ (t << 28)
+    return b & MASK64
+
+def symmetry(b, s):
+    if s & 1:
+        b = horizontal_mirror(b)
+    if s & 2:
+        b = vertical_mirror(b)
+    if s & 4:
+        b = transpose(b)
+    return b
+
+# symmetry undoing symmetry s: every transform is its own inverse except mirror + transpose pairs
+INVERSE_SYMMETRY = (0, 1, 2, 3, 4, 6, 5, 7)
+
+def square_symmetry(x, s):
+    # image of square x (0 = A1 ... 63 = H8, -1 = pass) under symmetry s
+    if x < 0:
+        return x
+    return symmetry(1 << x, s).bit_length() - 1
+
+class Position(tuple):
+    __slots__ = ()
+
+    def __new__(cls, player, opponent):
+        return tuple.__new__(cls, (player, opponent))
+
+    player = property(itemgetter(0))
+    opponent = property(itemgetter(1))
+
+    @classmethod
+    def from_board(cls, board):
+        return cls(board.player, board.opponent)
+
+    def to_board(self):
+        return Board(self[0], self[1])
+
+    @property
+    def _as_parameter_(self):
+        # lets a Position go wherever edax.so expects a Board*. A tuple has no room to keep a struct, so each call packs
+        # the two words into a new 16 byte Board: a loop passing the same position many times should to_board() it once
+        return ctypes.byref(Board(self[0], self[1]))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (Position, (self[0], self[1]))
+
+    def __repr__(self):
+        return "Position(0x{:016x}, 0x{:016x})".format(self[0], self[1])
+
+    def swap(self):
+        return Position(self[1], self[0])
+
+    def empties(self):
+        return 64 - (self[0] | self[1]).bit_count()
+
+    def symmetry(self, s):
+        return Position(symmetry(self[0], s), symmetry(self[1], s))
+
+    def symmetries(self):
+        return [self.symmetry(s) for s in range(8)]
+
+    def canonical(self):
+        """
+            Smallest of the 8 symmetric positions (same order as edax board_unique).
+            :return: (canonical position, s) where canonical == self.symmetry(s)
+        """
+        best, best_s = self, 0
+        for s in range(1, 8):
+            sym = self.symmetry(s)
+            if sym < best:
+                best, best_s = sym, s
+        return best, best_s
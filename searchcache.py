@@ -0,0 +1,254 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from multiprocessing import util
+import numpy as np
+
+import edaxengine
+import symmetry
+from position import INVERSE_SYMMETRY, MASK64, Position, square_symmetry
+
+'''
+    Search result cache: an in-memory LRU in front of an SQLite file, so positions solved once (openings of every
+    tournament game, positions shared by labelling runs) are not searched again.
+    Keys are the canonical position (Position.canonical / symmetry.canonicalize, the same order), the edax level and the
+    engine (engine_id: in-process edax or mEdax, and the options that change results, eg. hash size or opening book),
+    so the 8 symmetric positions share one entry and results of different search setups are never mixed. The best
+    move is stored on the canonical position and mapped back on lookup. Values: move (-1 for pass), score, score
+    bounds, depth and nodes (0 when the search did not report them).
+    Concurrent processes share the file: SQLite in WAL mode lets readers run next to one writer, writers wait up to
+    BUSY_TIMEOUT for each other and an entry is written once (a position has one result per level and engine).
+    The process default cache is the file of set_cache_path or $SEARCH_CACHE; players and labelers use it when set.
+'''
+
+SEARCH_CACHE_ENV = "SEARCH_CACHE"
+LRU_SIZE = 1 << 16 # entries kept in memory
+BUSY_TIMEOUT = 60.0 # seconds a writer waits for the file lock
+QUERY_CHUNK = 500 # positions per SELECT of get_many, well below the SQLite bound on query parameters
+IN_PROCESS = "edax.so" # edaxengine searches, never from the opening book
+MEDAX = "mEdax" # searches of an mEdax process, eg. the solve server
+
+# mEdax options without value, options that do not change search results (the level is keyed on its own) and aliases
+FLAG_OPTIONS = {"vv", "q", "info", "debug-cassio", "follow-cassio", "cpu", "?", "help"}
+IGNORED_OPTIONS = FLAG_OPTIONS | {"l", "verbose", "mode", "name", "echo", "ponder", "auto-start", "auto-store",
+                                  "auto-swap", "auto-quit", "repeat", "game-file", "search-log-file", "ui-log-file",
+                                  "ggs-log-file", "ggs-host", "ggs-login", "ggs-password", "ggs-port", "ggs-open"}
+OPTION_ALIASES = {"level": "l", "hash-table-size": "h", "n-tasks": "n", "depth": "d", "game-time": "t",
+                  "option-file": "o"}
+
+def engine_id(kind, options=()):
+    """
+        The engine part of the cache keys.
+        :param kind: IN_PROCESS or MEDAX
+        :param options: mEdax options of the searches (for IN_PROCESS the -h / -n of the edaxengine search)
+        :return: kind and the options that change results, aliases unified and sorted, eg. "mEdax -book-usage off -h 22"
+    """
+    options = list(options)
+    pairs = []
+    i = 0
+    while i < len(options):
+        name = options[i].lstrip("-")
+        name = OPTION_ALIASES.get(name, name)
+        value = None if name in FLAG_OPTIONS else options[i + 1] if i + 1 < len(options) else ""
+        i += 1 if value is None else 2
+        if name not in IGNORED_OPTIONS:
+            pairs.append("-{} {}".format(name, value))
+    return " ".join([kind] + sorted(pairs))
+
+# edaxengine.solve_boards / solve_batch: one single-task search per position, default hash size
+BATCH_ENGINE = engine_id(IN_PROCESS, ["-h", str(edaxengine.DEFAULT_HASH_SIZE), "-n", "1"])
+
+def _signed(x):
+    # SQLite integers are signed 64 bit
+    x = int(x)
+    return x - (1 << 64) if x >> 63 else x
+
+class SearchCache:
+
+    '''
+        path - SQLite file, created if missing
+        max_entries - size of the in-memory LRU
+        hits, misses - lookups answered / not answered, memory and disk together
+    '''
+    def __init__(self, path, max_entries=LRU_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = None
+        self.pid = None
+
+    def connection(self):
+        # one connection per process, a forked child never uses its parent's
+        if self.db is None or self.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            # a file of the first schema keeps its table "results", whose entries have no engine and are not used
+            db.execute("CREATE TABLE IF NOT EXISTS searches (player INTEGER, opponent INTEGER, level INTEGER, "
+                       "engine TEXT, move INTEGER, score INTEGER, lower INTEGER, upper INTEGER, depth INTEGER, "
+                       "nodes INTEGER, PRIMARY KEY (player, opponent, level, engine)) WITHOUT ROWID")
+            self.db, self.pid = db, os.getpid()
+        return self.db
+
+    def remember(self, key, value):
+        self.lru[key] = value
+        self.lru.move_to_end(key)
+        if len(self.lru) > self.max_entries:
+            self.lru.popitem(last=False)
+
+    def get(self, board, level, engine):
+        """
+            :param board: Board / Position, side to move as player
+            :param level: edax level of the search
+            :param engine: engine_id of the search
+            :return: dict with move (on board, -1 for pass), score, score_lowerbound, score_upperbound, depth and nodes
+                     as edaxengine.EdaxEngine.search, None if the position was not searched at this level
+        """
+        canonical, s = Position.from_board(board).canonical()
+        key = (canonical.player, canonical.opponent, level, engine)
+        with self.lock:
+            value = self.lru.get(key)
+            if value is None:
+                value = self.connection().execute(
+                    "SELECT move, score, lower, upper, depth, nodes FROM searches WHERE player=? AND opponent=? AND "
+                    "level=? AND engine=?", (_signed(key[0]), _signed(key[1]), level, engine)).fetchone()
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.remember(key, value)
+        move, score, lower, upper, depth, nodes = value
+        return {"move": square_symmetry(move, INVERSE_SYMMETRY[s]), "score": score, "score_lowerbound": lower,
+                "score_upperbound": upper, "depth": depth, "nodes": nodes}
+
+    def put(self, board, level, engine, result):
+        """
+            Store a search result of board at level by engine (engine_id).
+            :param result: dict with move (on board), score and depth, optionally score_lowerbound, score_upperbound and
+                           nodes (an EdaxEngine.search or solve server result)
+        """
+        canonical, s = Position.from_board(board).canonical()
+        score = result["score"]
+        value = (square_symmetry(result["move"], s), score, result.get("score_lowerbound", score),
+                 result.get("score_upperbound", score), result["depth"], result.get("nodes") or 0)
+        key = (canonical.player, canonical.opponent, level, engine)
+        with self.lock:
+            self.remember(key, value)
+            self.connection().execute("INSERT OR IGNORE INTO searches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                      (_signed(key[0]), _signed(key[1]), level, engine) + value)
+
+    def get_many(self, player, opponent, level, engine):
+        """
+            Batch get for the labelers.
+            :param player: uint64 array
+            :param opponent: uint64 array
+            :param engine: engine_id of the searches, BATCH_ENGINE for edaxengine.solve_boards
+            :return: (found, scores, depths, moves) - bool array and int32 arrays (moves on the given positions, -1 for
+                     pass), valid where found
+        """
+        cp, co, s = symmetry.canonicalize(np.asarray(player, dtype=np.uint64), np.asarray(opponent, dtype=np.uint64))
+        n = len(cp)
+        found = np.zeros(n, dtype=bool)
+        scores, depths, moves = (np.zeros(n, dtype=np.int32) for _ in range(3))
+        keys = [(int(p), int(o), level, engine) for p, o in zip(cp, co)]
+        values = {}
+        with self.lock:
+            missing = []
+            for key in keys:
+                if key in self.lru:
+                    values[key] = self.lru[key]
+                else:
+                    missing.append(key)
+            missing = list(dict.fromkeys(missing))
+            for start in range(0, len(missing), QUERY_CHUNK):
+                chunk = missing[start:start + QUERY_CHUNK]
+                rows = self.connection().execute(
+                    "SELECT player, opponent, move, score, lower, upper, depth, nodes FROM searches WHERE level=? AND "
+                    "engine=? AND (player, opponent) IN (VALUES {})".format(", ".join(["(?, ?)"] * len(chunk))),
+                    [level, engine] + [_signed(x) for key in chunk for x in key[:2]]).fetchall()
+                for row in rows:
+                    key = (row[0] & MASK64, row[1] & MASK64, level, engine)
+                    values[key] = row[2:]
+                    self.remember(key, row[2:])
+            for i, key in enumerate(keys):
+                value = values.get(key)
+                if value is not None:
+                    found[i] = True
+                    moves[i], scores[i], depths[i] = value[0], value[1], value[4]
+            self.hits += int(found.sum())
+            self.misses += n - int(found.sum())
+        moves = symmetry.square_symmetry(moves, symmetry.inverse(s)).astype(np.int32)
+        return found, scores, depths, moves
+
+    def put_many(self, player, opponent, level, engine, scores, depths, moves):
+        # batch put of solve_batch results (bounds = score), in one transaction
+        cp, co, s = symmetry.canonicalize(np.asarray(player, dtype=np.uint64), np.asarray(opponent, dtype=np.uint64))
+        moves = symmetry.square_symmetry(np.asarray(moves), s)
+        rows = []
+        with self.lock:
+            for p, o, move, score, depth in zip(cp, co, moves, scores, depths):
+                value = (int(move), int(score), int(score), int(score), int(depth), 0)
+                self.remember((int(p), int(o), level, engine), value)
+                rows.append((_signed(p), _signed(o), level, engine) + value)
+            db = self.connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany("INSERT OR IGNORE INTO searches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self.lock:
+            if self.db is not None and self.pid == os.getpid():
+                self.db.close()
+            self.db = None
+
+    def __len__(self):
+        # entries on disk
+        with self.lock:
+            return self.connection().execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+
+def solve_boards(boards, level, cache=None, n_threads=None):
+    """
+        edaxengine.solve_boards that searches only the positions missing from cache and stores their results.
+        :param boards: boardarray.BoardArray
+        :param cache: SearchCache, defaults to get_cache(). Without any cache every position is searched
+        :return: (scores, depths, moves) int32 arrays, move -1 for pass
+    """
+    if cache is None:
+        cache = get_cache()
+    if cache is None:
+        return edaxengine.solve_boards(boards, level, n_threads)
+    found, scores, depths, moves = cache.get_many(boards.player, boards.opponent, level, BATCH_ENGINE)
+    missing = np.flatnonzero(~found)
+    if len(missing):
+        todo = boards[missing]
+        solved = edaxengine.solve_boards(todo, level, n_threads)
+        scores[missing], depths[missing], moves[missing] = solved
+        cache.put_many(todo.player, todo.opponent, level, BATCH_ENGINE, *solved)
+    return scores, depths, moves
+
+_cache = None
+_cache_path = None
+
+def set_cache_path(path):
+    # file of the process default cache, overrides $SEARCH_CACHE. None goes back to the environment
+    global _cache_path
+    _cache_path = path
+
+def get_cache():
+    # the process default SearchCache, None if no file is set
+    global _cache
+    path = _cache_path or os.environ.get(SEARCH_CACHE_ENV)
+    if path is None:
+        return None
+    if _cache is None or _cache.path != path:
+        _cache = SearchCache(path)
+        util.Finalize(_cache, _cache.close, exitpriority=10)
+    return _cache
@@ -0,0 +1,158 @@
+import itertools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import util
+
+from edaxengine import option_level
+from players.edax_pool import (CLOSE_TIMEOUT, EDAX_BIN, EngineError, NBoardEngine, board_to_ggf, new_result,
+                               obf_to_ggf, parse_reply_line)
+
+'''
+    Solve server - one long-lived mEdax (NBoard protocol, players/edax_pool.NBoardEngine) searching positions for every
+    thread of a process. Replaces writing each position to a fixed tmp_obf_file and spawning `mEdax -solve` on it,
+    which costs a process start per position and lets parallel callers overwrite each other's input.
+    Requests stream down the engine's stdin pipe: the position (`game`), its search limit (`level`, `move-time`), `go`
+    and `ping <id>`. Edax answers them in order and ends each reply with `pong <id>`, which resolves the Future of that
+    request. Any number of threads may submit at once, their requests queue in the pipe. A crashed engine fails its
+    pending requests and the next request starts a new one.
+    The engine searches with its opening book off, like `mEdax -solve`: a book position gets a searched score and depth,
+    not the book's.
+'''
+
+BOOK_OFF = ["-book-usage", "off"] # before the caller's options, which may turn the book back on
+
+class SolveServer:
+
+    '''
+        options - mEdax options of the engine, BOOK_OFF followed by the given ones, eg. ['-l', '16', '-h', '22']
+        level - search level of requests that do not give one, the -l option by default
+        pending - (engine, Future) by request id of the requests sent and not answered yet
+    '''
+    def __init__(self, options=(), binary=EDAX_BIN):
+        self.options = BOOK_OFF + list(options)
+        self.binary = binary
+        self.level = option_level(self.options)
+        self.engine = None
+        self.reader = None
+        self.pending = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock() # pending and ids, shared with the reader thread
+        self.write_lock = threading.Lock() # engine start and request order in the pipe
+
+    def start(self):
+        # caller holds write_lock
+        self.engine = NBoardEngine(self.options, self.binary).start()
+        self.reader = threading.Thread(target=self.read_replies, args=(self.engine,), daemon=True)
+        self.reader.start()
+
+    def read_replies(self, engine):
+        # reader thread of one engine: every reply goes to the Future of its request id
+        result, error = new_result(), None
+        try:
+            while True:
+                line = engine.readline()
+                if line.startswith("Error:"):
+                    error = line[6:].strip()
+                elif line.startswith("pong "):
+                    with self.lock:
+                        _, future = self.pending.pop(int(line.split()[1]), (None, None))
+                    if future is not None:
+                        if error is None and "move" in result:
+                            future.set_result(result)
+                        else:
+                            future.set_exception(EngineError("mEdax: {}".format(error or "no move in the reply")))
+                    result, error = new_result(), None
+                else:
+                    parse_reply_line(line, result)
+        except (EngineError, OSError, ValueError) as e:
+            with self.lock:
+                failed = [request_id for request_id, (owner, _) in self.pending.items() if owner is engine]
+                failed = [self.pending.pop(request_id)[1] for request_id in failed]
+            for future in failed:
+                future.set_exception(EngineError("solve server stopped: {}".format(e)))
+
+    def submit(self, position, level=None, move_time=None):
+        """
+            Queue the search of a position.
+            :param position: obf string or Board / Position (side to move as player)
+            :param level: edax level, defaults to the server level
+            :param move_time: seconds the search may take, the level still caps the depth. See clock.MIN_MOVE_TIME
+            :return: concurrent.futures.Future of the result: dict with move (-1 for pass), score, depth, accuracy,
+                     nodes and time (ms)
+        """
+        game = obf_to_ggf(position) if isinstance(position, str) else board_to_ggf(position)
+        limit = "level {}\n".format(self.level if level is None else level)
+        if move_time is not None:
+            limit += "move-time {:.3f}\n".format(move_time)
+        future = Future()
+        with self.write_lock:
+            if self.engine is None or not self.engine.alive:
+                if self.engine is not None:
+                    self.engine.kill()
+                self.start()
+            with self.lock:
+                request_id = next(self.ids)
+                self.pending[request_id] = (self.engine, future)
+            try:
+                self.engine.send("game {}\n{}go\nping {}\n".format(game, limit, request_id))
+            except EngineError as e:
+                with self.lock:
+                    self.pending.pop(request_id, None)
+                future.set_exception(e)
+        return future
+
+    def solve(self, position, level=None, move_time=None, timeout=None):
+        # submit and wait, see submit
+        return self.submit(position, level, move_time).result(timeout)
+
+    def close(self):
+        with self.write_lock:
+            engine, self.engine = self.engine, None
+            if engine is None:
+                return
+            try:
+                engine.send("quit\n")
+            except EngineError:
+                pass
+            # the reader stops at the end of the output, then nothing reads the engine any more
+            self.reader.join(CLOSE_TIMEOUT)
+            engine.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_servers = {}
+_servers_pid = None
+_servers_lock = threading.Lock()
+
+def get_server(options=()):
+    # the solve server of this process for an option set, closed at exit (see edax_pool.get_pool)
+    global _servers, _servers_pid
+    with _servers_lock:
+        if _servers_pid != os.getpid():
+            _servers = {}
+            _servers_pid = os.getpid()
+        server = _servers.get(tuple(options))
+        if server is None:
+            server = _servers[tuple(options)] = SolveServer(options)
+            util.Finalize(server, server.close, exitpriority=10)
+        return server
+
+if __name__ == '__main__':
+    # python solveserver.py obf_file level [threads]: solve every position of an obf file from concurrent threads
+    from concurrent.futures import ThreadPoolExecutor
+    with open(sys.argv[1]) as f:
+        problems = [line.strip() for line in f if line.strip()]
+    level = int(sys.argv[2])
+    start = time.time()
+    with SolveServer() as server, ThreadPoolExecutor(int(sys.argv[3]) if len(sys.argv) > 3 else 4) as executor:
+        results = list(executor.map(lambda obf: server.solve(obf, level), problems))
+    for obf, result in zip(problems, results):
+        print(obf, result["move"], result["score"], result["depth"], result["nodes"])
+    print("{} positions in {:.3f}s".format(len(problems), time.time() - start), file=sys.stderr)
@@ -0,0 +1,112 @@
+import numpy as np
+
+from boardarray import BoardArray
+from clib import as_bitboards
+from position import INVERSE_SYMMETRY
+
+'''
+    Vectorized 8-fold symmetry of uint64 bitboard arrays, the NumPy counterpart of Position.symmetry/canonical.
+    Symmetry index s follows edax board_symetry: bit 0 mirrors columns (A <-> H), bit 1 mirrors rows (1 <-> 8), bit 2
+    transposes, applied in that order. Canonical = lexicographically smallest (player, opponent), as edax board_unique.
+'''
+
+N_SYMMETRIES = 8
+
+def _u64(x):
+    return np.uint64(x)
+
+def horizontal_mirror(b):
+    b = ((b >> _u64(1)) & _u64(0x5555555555555555)) | ((b << _u64(1)) & _u64(0xAAAAAAAAAAAAAAAA))
+    b = ((b >> _u64(2)) & _u64(0x3333333333333333)) | ((b << _u64(2)) & _u64(0xCCCCCCCCCCCCCCCC))
+    b = ((b >> _u64(4)) & _u64(0x0F0F0F0F0F0F0F0F)) | ((b << _u64(4)) & _u64(0xF0F0F0F0F0F0F0F0))
+    return b
+
+def vertical_mirror(b):
+    return b.byteswap()
+
+def transpose(b):
+    t = (b ^ (b >> _u64(7))) & _u64(0x00AA00AA00AA00AA)
+    b = b ^ t ^ (t << _u64(7))
+    t = (b ^ (b >> _u64(14))) & _u64(0x0000CCCC0000CCCC)
+    b = b ^ t ^ (t << _u64(14))
+    t = (b ^ (b >> _u64(28))) & _u64(0x00000000F0F0F0F0)
+    b = b ^ t ^ (t << _u64(28))
+    return b
+
+def symmetry(b, s):
+    # image of every bitboard in b under one symmetry s
+    b = as_bitboards(b)
+    if s & 1:
+        b = horizontal_mirror(b)
+    if s & 2:
+        b = vertical_mirror(b)
+    if s & 4:
+        b = transpose(b)
+    return b
+
+def all_symmetries(b):
+    """
+        :param b: uint64 array, shape (n,)
+        :return: uint64 array, shape (8, n), row s = symmetry(b, s)
+    """
+    b = as_bitboards(b)
+    out = np.empty((N_SYMMETRIES,) + b.shape, dtype=np.uint64)
+    out[0] = b
+    out[1] = horizontal_mirror(b)
+    out[2] = vertical_mirror(b)
+    out[3] = vertical_mirror(out[1])
+    out[4:] = transpose(out[:4])
+    return out
+
+def canonicalize(player, opponent):
+    """
+        Canonical representative of every position.
+        :param player: uint64 array
+        :param opponent: uint64 array
+        :return: (canonical_player, canonical_opponent, s) with canonical = symmetry(position, s), s as uint8
+    """
+    sym_player, sym_opponent = all_symmetries(player), all_symmetries(opponent)
+    # lexsort: last key is primary
+    best = np.lexsort((sym_opponent, sym_player), axis=0)[0]
+    cols = np.arange(sym_player.shape[1])
+    return sym_player[best, cols], sym_opponent[best, cols], best.astype(np.uint8)
+
+def canonicalize_boards(boards):
+    # canonicalize for a boardarray.BoardArray, returns (BoardArray, s)
+    player, opponent, s = canonicalize(boards.player, boards.opponent)
+    return BoardArray.from_bitboards(player, opponent), s
+
+def unique_boards(boards):
+    """
+        Drop symmetric and exact duplicates from a BoardArray.
+        :return: (unique canonical BoardArray, index of the first original of each, inverse) with
+                 canonical[inverse] == canonicalize_boards(boards)[0]
+    """
+    canonical, _ = canonicalize_boards(boards)
+    _, index, inverse_index = np.unique(canonical.data, return_index=True, return_inverse=True)
+    return canonical[index], index, inverse_index.reshape(-1)
+
+def inverse(s):
+    # symmetry undoing s, vectorized
+    return np.asarray(INVERSE_SYMMETRY, dtype=np.uint8)[s]
+
+def square_symmetry(x, s):
+    """
+        Map squares through symmetries (eg. a best move found on the canonical position back onto the original with
+        square_symmetry(move, inverse(s))). Vectorized over x and s, -1 (pass) is kept.
+        :param x: int array of squares 0..63 or -1
+        :param s: symmetry index, scalar or array
+    """
+    x = np.asarray(x)
+    return np.where(x < 0, x, SQUARE_SYMMETRY[np.asarray(s), np.clip(x, 0, 63)])
+
+def _square_table():
+    table = np.empty((N_SYMMETRIES, 64), dtype=np.int8)
+    bits = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+    for s in range(N_SYMMETRIES):
+        mapped = symmetry(bits, s)
+        # log2 of a single bit, exact in float64
+        table[s] = np.log2(mapped.astype(np.float64)).astype(np.int8)
+    return table
+
+SQUARE_SYMMETRY = _square_table()
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# the modules live at the repository root, as for the scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MEDAX_ENV = "MEDAX_BIN" # mEdax binary of the engine tests, ./bin/mEdax by default (its data/ next to bin/)
+
+@pytest.fixture(scope="session")
+def libc():
+    # edax.so from $EDAX_SO or edax_so/edax.so, see clib.py
+    from clib import LibC
+    try:
+        return LibC()
+    except OSError as e:
+        pytest.skip("edax.so cannot be loaded: {}".format(e))
+
+@pytest.fixture(scope="session")
+def edax(libc):
+    # in-process edax (edaxengine) with eval weights from $EDAX_EVAL or edax_data/eval.dat
+    import edaxengine
+    try:
+        edaxengine.global_init()
+    except FileNotFoundError as e:
+        pytest.skip(str(e))
+    return edaxengine
+
+@pytest.fixture
+def medax(monkeypatch):
+    # absolute path of mEdax, the test runs in the directory holding its bin/ and data/
+    path = os.path.abspath(os.environ.get(MEDAX_ENV, os.path.join("bin", "mEdax")))
+    if not os.access(path, os.X_OK):
+        pytest.skip("no mEdax binary at {}".format(path))
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(path)))
+    return path
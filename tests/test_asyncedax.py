@@ -0,0 +1,64 @@
+import asyncio
+import random
+
+from asyncedax import AsyncEdaxPlayer, EnginePool, run_match
+from clib import Board
+from gamerecord import GameRecordWriter, GameRecords
+from observers import RecordObserver
+
+class YieldingPlayer:
+
+    '''
+        Random legal moves, handing the event loop to the other games before each one so concurrent games interleave.
+    '''
+    def __init__(self, name, seed):
+        self.name = name
+        self.rng = random.Random(seed)
+
+    def new_game(self, board=None):
+        pass
+
+    async def get_move(self, board, moves=None):
+        await asyncio.sleep(0)
+        return self.rng.choice([i for i in range(64) if (moves >> i) & 1])
+
+def replay_discs(libc, moves):
+    # disc count of the final position of a move list, every move checked against the legal moves
+    board = Board(0, 0)
+    libc.board_init(board)
+    for move in moves:
+        legal = libc.get_moves(board.player, board.opponent)
+        if move == -1:
+            assert legal == 0
+            libc.board_swap_players(board)
+        else:
+            assert (legal >> move) & 1
+            libc.board_update(board, move, board)
+    return bin(board.player | board.opponent).count("1")
+
+def test_concurrent_games_record_separately(libc, tmp_path):
+    path = str(tmp_path / "records")
+    writer = GameRecordWriter(path)
+    players = [YieldingPlayer("a", 1), YieldingPlayer("b", 2)]
+    result = asyncio.run(run_match(players, 16, max_games=8, make_observers=lambda game_id: [RecordObserver(writer)],
+                                   verbose=False))
+    writer.close()
+    assert result.games == 16 and not result.errors
+    records = GameRecords.load(path)
+    assert len(records) == 16
+    for i in range(len(records)):
+        header = records.header[i]
+        assert replay_discs(libc, records.game_moves(i)) == header["discs0"] + header["discs1"]
+
+def test_pool_without_binary_fails_games_not_match(libc, medax):
+    async def match():
+        async with EnginePool(1, ['-l', '1'], binary=medax) as pool:
+            players = [AsyncEdaxPlayer("edax", pool), YieldingPlayer("random", 3)]
+            # the engine dies and cannot be restarted
+            pool.engines[0].binary = medax + ".missing"
+            await pool.engines[0].kill()
+            return await run_match(players, 4, max_games=2, verbose=False), pool
+    result, pool = asyncio.run(match())
+    assert result.games == 0 and len(result.errors) == 4
+    assert "cannot restart" in result.errors[0][1] or "cannot restart" in result.errors[1][1]
+    assert pool.engines == []
@@ -0,0 +1,14 @@
+from checkpoint import Checkpoint
+
+def test_resume_after_torn_line(tmp_path):
+    path = str(tmp_path / "journal")
+    with Checkpoint(path, interval=0) as journal:
+        journal.add({"players": ["a", "b"]})
+        journal.add([0, 1, [20, 44]])
+    # a run killed in the middle of a flush
+    with open(path, "ab") as f:
+        f.write(b'[1,0,[3')
+    assert Checkpoint.load(path) == [{"players": ["a", "b"]}, [0, 1, [20, 44]]]
+    with Checkpoint(path, interval=0) as journal:
+        journal.add([1, 0, [33, 31]])
+    assert Checkpoint.load(path) == [{"players": ["a", "b"]}, [0, 1, [20, 44]], [1, 0, [33, 31]]]
@@ -0,0 +1,19 @@
+import numpy as np
+
+import searchcache
+from boardarray import BoardArray
+
+def test_solve_strided_boards(edax, tmp_path):
+    boards = BoardArray.from_obf([
+        "------------O------OOX-----XOX----XXOO----XO-O------------------ X;",
+        "---------------------------OX------XO--------------------------- X;",
+        "--OOOOO-X-OOOO--XXOXOOOOXXXOXOOOXXXXOXOOXXXOXXOO--XXOXO----XXXX- O;",
+        "------------O------OOX-----XOO----XXOX----XO-O------------------ O;",
+    ])
+    strided = boards[::2]
+    assert not strided.data.flags["C_CONTIGUOUS"]
+    expected = edax.solve_boards(strided.copy(), 2, n_threads=1)
+    for solved in (edax.solve_boards(strided, 2, n_threads=1),
+                   searchcache.solve_boards(strided, 2, searchcache.SearchCache(str(tmp_path / "cache")), 1)):
+        for got, want in zip(solved, expected):
+            np.testing.assert_array_equal(got, want)
@@ -0,0 +1,21 @@
+from position import Position
+from searchcache import IN_PROCESS, MEDAX, SearchCache, engine_id
+
+START = Position(0x0000000810000000, 0x0000001008000000)
+
+def test_engine_id_normalizes_options():
+    assert engine_id(MEDAX, ["-level", "20", "-hash-table-size", "22", "-vv", "-book-usage", "off"]) == \
+           engine_id(MEDAX, ["-book-usage", "off", "-h", "22", "-l", "10"]) == "mEdax -book-usage off -h 22"
+    assert engine_id(MEDAX, ["-h", "22"]) != engine_id(MEDAX, ["-h", "22", "-book-usage", "off"])
+
+def test_engines_do_not_share_entries(tmp_path):
+    cache = SearchCache(str(tmp_path / "cache.db"))
+    solver, book = engine_id(IN_PROCESS, ["-h", "21", "-n", "1"]), engine_id(MEDAX)
+    cache.put(START, 10, book, {"move": 19, "score": 0, "depth": 0})
+    assert cache.get(START, 10, solver) is None
+    cache.put(START, 10, solver, {"move": 26, "score": 2, "depth": 10})
+    cache.close()
+    # the entries come back from the file, not the memory of the first cache
+    cache = SearchCache(str(tmp_path / "cache.db"))
+    assert (cache.get(START, 10, book)["depth"], cache.get(START, 10, solver)["depth"]) == (0, 10)
+    assert len(cache) == 2
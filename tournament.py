@@ -0,0 +1,329 @@
+import argparse
+import os
+import sys
+import time
+import traceback
+from multiprocessing import Array, Event, Pipe, Process, Queue
+from multiprocessing.connection import wait
+
+import searchcache
+from checkpoint import Checkpoint
+from clock import Clock
+from maingame import build_players, play, play_opening
+from matchstats import MatchStats, SPRT
+from openings import load as load_openings
+from gamerecord import DEFAULT_CHUNK_SIZE, GameRecordWriter
+from observers import RecordObserver
+from utils import LibC
+
+'''
+    Tournament runner - a fixed pool of long-lived worker processes plays total_games games between the same two
+    players. Each worker builds its players and LibC once and reuses them (and their engines) for every game it takes
+    from the task queue. Results go back through a pipe per worker to the parent, the only process that counts them,
+    so totals always add up to the games played. With a checkpoint file the parent journals every finished game
+    (checkpoint.py), and a resumed run plays only the games missing from it.
+    A worker killed outside python (a crash in edax.so, the OOM killer) loses its game in flight: the game is counted as
+    failed once everything the worker sent is read, and a new worker takes the place of the dead one.
+    Journal entries: the match header (dict), results (game_id, winner, cnts[, clocks]) and, with a record file,
+    {"record_size": bytes} before each periodic flush and once the workers are gone (finished or interrupted run) -
+    every journaled game is recorded below that size.
+    players - spec tuples ({class_name}, {name}, *{initialization_vars}) as in maingame, built inside every worker
+'''
+
+REPORT_INTERVAL = 10.0 # seconds between progress lines
+POLL_INTERVAL = 1.0 # seconds between checks that workers are still alive while waiting for results
+IDLE = -1 # game slot of a worker between games
+
+class TournamentAborted(RuntimeError):
+    # every worker died before the end of the match, result holds the games counted so far
+    def __init__(self, message, result):
+        super().__init__(message)
+        self.result = result
+
+def worker(players, tasks, results, record_file=None, openings=None, stop=None, time_control=None,
+           record_chunk_size=DEFAULT_CHUNK_SIZE, cache=None, current=None, slot=0):
+    # results: the worker end of its pipe, send returns once the result is in the pipe (a Queue keeps it in a feeder
+    # thread, lost if the worker is killed). current[slot]: game being played, for the parent to find the game of a
+    # worker that died
+    if cache is not None:
+        searchcache.set_cache_path(cache)
+    libc = LibC()
+    players = build_players(players)
+    clocks = [Clock(time_control), Clock(time_control)] if time_control is not None else None
+    if isinstance(openings, str):
+        # every worker maps the same file, the pages are shared
+        openings = load_openings(openings)
+    record = GameRecordWriter(record_file, record_chunk_size) if record_file is not None else None
+    observers = [RecordObserver(record)] if record is not None else []
+    try:
+        while True:
+            game_id = tasks.get()
+            # stop: the match is decided (SPRT), remaining games are skipped
+            if game_id is None or (stop is not None and stop.is_set()):
+                break
+            if current is not None:
+                current[slot] = game_id
+            try:
+                if openings is None:
+                    cnts, winner = play(players, libc, observers, clocks=clocks)
+                else:
+                    cnts, winner = play_opening(players, openings, game_id, libc, observers, clocks)
+                if clocks is None:
+                    results.send((game_id, winner, cnts))
+                else:
+                    results.send((game_id, winner, cnts, [(c.used, len(c.times), c.flagged) for c in clocks]))
+            except Exception:
+                results.send((game_id, None, traceback.format_exc()))
+            if current is not None:
+                current[slot] = IDLE
+    finally:
+        if record is not None:
+            record.close()
+        for player in players:
+            if hasattr(player, "close"):
+                player.close()
+
+class TournamentResult:
+
+    '''
+        wins - [player 0 wins, player 1 wins, draws]
+        discs - total discs of each player over all games
+        errors - (game_id, traceback) of games that raised
+        stats - matchstats.MatchStats of player 0
+        sprt - SPRT decision ("H0" / "H1") if the match was stopped early
+        think_time, moves, flagged - per player with clocks: seconds thinking, moves timed, games over budget
+        resumed - games loaded from a checkpoint, not played by this run
+    '''
+    def __init__(self, names, paired=False):
+        self.names = names
+        self.stats = MatchStats(paired)
+        self.sprt = None
+        self.wins = [0, 0, 0]
+        self.discs = [0, 0]
+        self.errors = []
+        self.think_time = [0.0, 0.0]
+        self.moves = [0, 0]
+        self.flagged = [0, 0]
+        self.resumed = 0
+        self.start = time.time()
+        self.end = None
+
+    @property
+    def games(self):
+        return sum(self.wins)
+
+    def add(self, game_id, winner, cnts, clocks=None):
+        # clocks: (seconds used, moves, over budget) per player of a game with clocks
+        if winner is None:
+            self.errors.append((game_id, cnts))
+            return
+        self.wins[winner] += 1
+        self.stats.add(game_id, (1, 0, 0.5)[winner])
+        self.discs[0] += cnts[0]
+        self.discs[1] += cnts[1]
+        if clocks is not None:
+            for i, (used, moves, flagged) in enumerate(clocks):
+                self.think_time[i] += used
+                self.moves[i] += moves
+                self.flagged[i] += flagged
+
+    def elapsed(self):
+        return (self.end or time.time()) - self.start
+
+    def games_per_second(self):
+        return (self.games - self.resumed) / max(self.elapsed(), 1e-9)
+
+    def progress(self, total_games):
+        return "{}/{} games, {:.2f} games/s".format(self.games + len(self.errors), total_games,
+                                                    self.games_per_second())
+
+    def summary(self):
+        lines = ['{} wins {}/{} games!'.format(self.names[0], self.wins[0], self.games),
+                 '{} wins {}/{} games!'.format(self.names[1], self.wins[1], self.games),
+                 'Draw {}/{} games!'.format(self.wins[2], self.games)]
+        if self.resumed:
+            lines.append('{} games resumed from the checkpoint'.format(self.resumed))
+        if self.errors:
+            lines.append('{} games failed, first error:\n{}'.format(len(self.errors), self.errors[0][1]))
+        lines.append("{}: {}".format(self.names[0], self.stats.summary()))
+        if self.sprt is not None:
+            lines.append("SPRT: {} accepted".format(self.sprt))
+        if any(self.moves):
+            lines.append("Clock: " + ", ".join("{} {:.3f}s per move, {} games over budget".format(
+                name, think_time / max(moves, 1), flagged)
+                for name, think_time, moves, flagged in zip(self.names, self.think_time, self.moves, self.flagged)))
+        lines.append("Time: {:.6f} seconds, {:.2f} games/s".format(self.elapsed(), self.games_per_second()))
+        return "\n".join(lines)
+
+def run_tournament(players, total_games=None, workers=None, verbose=True, record_file=None, openings=None,
+                   sprt=None, time_control=None, checkpoint=None, resume=False, cache=None):
+    """
+        :param players: two player spec tuples, players[0] moves first in every game (without openings)
+        :param total_games: number of games, defaults to both colors of every opening
+        :param workers: worker processes, defaults to cpu count
+        :param verbose: print progress every REPORT_INTERVAL seconds
+        :param record_file: game record file every worker appends its games to (gamerecord.py)
+        :param openings: opening suite (.npy file, loaded with mmap by every worker, or a BoardArray). Game i plays
+                         opening i // 2 with colors swapped on odd i, wins are still counted per player
+        :param sprt: matchstats.SPRT on the Elo of players[0], the match stops as soon as it accepts a hypothesis
+                     (games already running are finished and counted)
+        :param time_control: "budget+increment" seconds per player and game (clock.py), eg. "60+0.5". Edax players
+                             get their time per move from their clock instead of searching to their level only
+        :param checkpoint: journal file of finished games, flushed every CHECKPOINT_INTERVAL seconds and on exit.
+                           On resume record_file is cut back to its size at the last flush, so only the few games
+                           in flight at that moment can be recorded twice
+        :param resume: continue the match journaled in checkpoint, skipping its finished games (failed games are
+                       played again). Without it an existing non-empty checkpoint is an error
+        :param cache: search cache file (searchcache.py) shared by the workers, solver players look their positions up
+                      there before searching (eg. the openings repeated in every game). Defaults to $SEARCH_CACHE
+        :return: TournamentResult. Raises TournamentAborted (with the partial result) if every worker died before the
+                 end of the match
+    """
+    if total_games is None:
+        total_games = 2 * len(load_openings(openings) if isinstance(openings, str) else openings)
+    names = [spec[1] for spec in players]
+    result = TournamentResult(names, paired=openings is not None)
+    header = {"players": names, "total_games": total_games, "openings": openings is not None}
+    done = set()
+    entries = []
+    if checkpoint is not None:
+        entries = Checkpoint.load(checkpoint)
+        if entries and not resume:
+            raise FileExistsError("{} holds a match in progress, resume it or remove the file".format(checkpoint))
+        if entries and entries[0] != header:
+            raise ValueError("{} is a checkpoint of another match: {}".format(checkpoint, entries[0]))
+        record_size = None
+        for entry in entries[1:]:
+            if isinstance(entry, dict):
+                record_size = entry["record_size"]
+                continue
+            result.add(*entry)
+            done.add(entry[0])
+        result.resumed = len(done)
+        if record_size is not None and record_file is not None and os.path.getsize(record_file) > record_size:
+            # records of games played after the last flush, the resumed run plays them again
+            os.truncate(record_file, record_size)
+        if sprt is not None:
+            result.sprt = sprt.status(result.stats)
+    remaining = [game_id for game_id in range(total_games) if game_id not in done]
+    if not remaining or result.sprt is not None:
+        result.end = time.time()
+        return result
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(remaining)))
+    tasks = Queue()
+    for game_id in remaining:
+        tasks.put(game_id)
+    for _ in range(workers):
+        tasks.put(None)
+
+    journal = None
+    if checkpoint is not None:
+        journal = Checkpoint(checkpoint)
+        if not entries:
+            journal.add(header)
+    # with a journal, workers write each record as soon as its game ends: a journaled game is never missing from
+    # record_file after a crash
+    record_chunk_size = 1 if journal is not None else DEFAULT_CHUNK_SIZE
+    stop = Event()
+    current = Array("i", [IDLE] * workers, lock=False)
+
+    def start_worker(slot):
+        receiver, sender = Pipe(duplex=False)
+        p = Process(target=worker, args=(players, tasks, sender, record_file, openings, stop, time_control,
+                                         record_chunk_size, cache, current, slot), daemon=True)
+        p.start()
+        sender.close()
+        return p, receiver
+
+    running = {slot: start_worker(slot) for slot in range(workers)} # slot -> (process, its result pipe)
+    exited = []
+    received = set() # game ids counted by this run
+    last_report = time.time()
+    finished = False
+    try:
+        while len(received) < len(remaining):
+            if not running:
+                # workers exit early once stop is set
+                if stop.is_set():
+                    break
+                raise TournamentAborted("all workers exited with {} games left".format(
+                    len(remaining) - len(received)), result)
+            ready = set(wait([c for _, c in running.values()] + [p.sentinel for p, _ in running.values()],
+                             POLL_INTERVAL))
+            items = []
+            for slot, (p, connection) in list(running.items()):
+                if p.sentinel not in ready:
+                    if connection in ready:
+                        try:
+                            items.append(connection.recv())
+                        except EOFError:
+                            pass # the pipe closes just before the worker exits
+                    continue
+                # exit seen before reading: everything a dead worker sent is in the pipe by then
+                try:
+                    while connection.poll():
+                        items.append(connection.recv())
+                except EOFError:
+                    pass
+                p.join()
+                connection.close()
+                exited.append(p)
+                del running[slot]
+                if p.exitcode and current[slot] != IDLE:
+                    # killed outside python (eg. a crash in edax.so): its game never reports, the others go on
+                    items.append((current[slot], None, "worker died with exit code {}".format(p.exitcode)))
+                    current[slot] = IDLE
+                    if not stop.is_set():
+                        running[slot] = start_worker(slot)
+            for item in items:
+                if item[0] in received:
+                    # sent just before its worker died
+                    continue
+                received.add(item[0])
+                result.add(*item)
+                if journal is not None and item[1] is not None:
+                    if record_file is not None and journal.due():
+                        journal.add({"record_size": os.path.getsize(record_file)})
+                    journal.add(item)
+                if sprt is not None and result.sprt is None:
+                    result.sprt = sprt.status(result.stats)
+                    if result.sprt is not None:
+                        stop.set()
+            if verbose and time.time() - last_report >= REPORT_INTERVAL:
+                last_report = time.time()
+                print(result.progress(total_games), file=sys.stderr)
+        finished = True
+    finally:
+        result.end = time.time()
+        for p in exited + [p for p, _ in running.values()]:
+            # workers flush their records and close their players after the last game
+            if not finished:
+                p.terminate()
+            p.join()
+        # game ids left after an early stop would otherwise block this process's exit on the queue feeder thread
+        tasks.cancel_join_thread()
+        if journal is not None:
+            # workers are gone: every game journaled so far, finished run or not, is in record_file below this size
+            if record_file is not None and os.path.exists(record_file):
+                journal.add({"record_size": os.path.getsize(record_file)})
+            journal.close()
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="random player a vs random player b")
+    parser.add_argument("total_games", type=int, nargs="?", default=100)
+    parser.add_argument("workers", type=int, nargs="?", default=None)
+    parser.add_argument("--openings", help="opening suite .npy, games play both colors of each opening")
+    parser.add_argument("--record-file", help="game record file to append the games to")
+    parser.add_argument("--time-control", help="budget+increment seconds per player and game, eg. 60+0.5")
+    parser.add_argument("--sprt", type=float, nargs=2, metavar=("ELO0", "ELO1"), help="stop once the SPRT decides")
+    parser.add_argument("--checkpoint", help="journal of finished games")
+    parser.add_argument("--resume", action="store_true", help="continue the match of --checkpoint")
+    parser.add_argument("--cache", help="search cache file of the solver players")
+    args = parser.parse_args()
+    players = [("RandomPlayer", "random player a"), ("RandomPlayer", "random player b")]
+    print(run_tournament(players, args.total_games, args.workers, record_file=args.record_file,
+                         openings=args.openings, sprt=SPRT(*args.sprt) if args.sprt else None,
+                         time_control=args.time_control, checkpoint=args.checkpoint, resume=args.resume,
+                         cache=args.cache).summary())
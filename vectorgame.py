@@ -0,0 +1,131 @@
+import sys
+import time
+import numpy as np
+
+from clib import Board, LibC
+from boardarray import BoardArray
+
+'''
+    VectorGame - n games between the same two players played in lockstep: one step() advances every unfinished game by
+    one ply with a handful of batched C calls, so the Python cost of a ply is paid once for the whole batch.
+    player/opponent - uint64 arrays, side to move of every game (as in Board)
+    turn - index in players of the side to move of every game, 0 is the player that moved first
+    over - game finished
+    history - (n, MAX_PLIES) int8 moves played, -1 is a pass, n_plies of them are valid per game
+
+    Batched players implement get_moves(player, opponent, moves): bitboard and legal move arrays of the games where they
+    are to move (never a forced pass), returning an int array of squares. Players with only get_move are called once
+    per game and ply.
+'''
+
+MAX_PLIES = 120 # 60 moves plus at most one pass before each of them
+
+class VectorGame:
+
+    '''
+        players - two player objects, players[0] moves first in every game
+        n - number of games, from the initial board unless boards (a BoardArray or (player, opponent) arrays) is given,
+            in which case players[0] is to move in each position
+    '''
+    def __init__(self, players, n=None, boards=None, libc=None):
+        self.players = players
+        self.libc = libc or LibC()
+        if boards is None:
+            board = Board(0, 0)
+            self.libc.board_init(board)
+            self.player = np.full(n, board.player, dtype=np.uint64)
+            self.opponent = np.full(n, board.opponent, dtype=np.uint64)
+        else:
+            player, opponent = (boards.player, boards.opponent) if isinstance(boards, BoardArray) else boards
+            self.player = np.array(player, dtype=np.uint64)
+            self.opponent = np.array(opponent, dtype=np.uint64)
+        n = len(self.player)
+        self.turn = np.zeros(n, dtype=np.int8)
+        self.over = np.zeros(n, dtype=np.bool_)
+        self.history = np.full((n, MAX_PLIES), -1, dtype=np.int8)
+        self.n_plies = np.zeros(n, dtype=np.int16)
+
+    def __len__(self):
+        return len(self.player)
+
+    def _ask(self, player, p, o, moves):
+        if hasattr(player, "get_moves"):
+            return np.asarray(player.get_moves(p, o, moves), dtype=np.int32)
+        return np.array([player.get_move(Board(int(a), int(b)), moves=int(m)) for a, b, m in
+                         zip(p.tolist(), o.tolist(), moves.tolist())], dtype=np.int32)
+
+    def step(self):
+        """
+            Play one ply in every unfinished game: a move, a pass, or marking the game over.
+            :return: number of games still running
+        """
+        active = np.flatnonzero(~self.over)
+        if len(active) == 0:
+            return 0
+        p, o = self.player[active], self.opponent[active]
+        moves = self.libc.get_moves_batch(p, o)
+
+        # no move for the side to move: pass, or game over when the other side cannot move either
+        stuck = np.flatnonzero(moves == 0)
+        if len(stuck):
+            finished = stuck[self.libc.get_moves_batch(o[stuck], p[stuck]) == 0]
+            if len(finished):
+                self.over[active[finished]] = True
+                keep = np.ones(len(active), dtype=np.bool_)
+                keep[finished] = False
+                active, p, o, moves = active[keep], p[keep], o[keep], moves[keep]
+
+        chosen = np.full(len(active), -1, dtype=np.int32)
+        turn = self.turn[active]
+        for k, player in enumerate(self.players):
+            ask = np.flatnonzero((turn == k) & (moves != 0))
+            if len(ask):
+                chosen[ask] = self._ask(player, p[ask], o[ask], moves[ask])
+        # a player move must be legal, and passing is only allowed without a legal move
+        played = chosen >= 0
+        legal = (moves >> np.where(played, chosen, 0).astype(np.uint64)) & np.uint64(1) == 1
+        ok = np.where(moves != 0, played & legal, ~played)
+        if not np.all(ok):
+            bad = np.flatnonzero(~ok)[0]
+            raise ValueError("illegal move {} in game {}".format(int(chosen[bad]), int(active[bad])))
+
+        self.libc.board_update_batch(p, o, chosen, p, o)
+        self.player[active], self.opponent[active] = p, o
+        self.turn[active] ^= 1
+        self.history[active, self.n_plies[active]] = chosen
+        self.n_plies[active] += 1
+        return len(active)
+
+    def play(self):
+        # play every game to the end, returns result()
+        while self.step():
+            pass
+        return self.result()
+
+    def result(self):
+        """
+            :return: (cnts, winner) cnts is an (n, 2) array of discs per player index, winner 0, 1 or 2 for a draw
+        """
+        player_count, opponent_count = self.libc.disc_count_batch(self.player, self.opponent)
+        cnts = np.empty((len(self), 2), dtype=np.uint8)
+        first_to_move = self.turn == 0
+        cnts[:, 0] = np.where(first_to_move, player_count, opponent_count)
+        cnts[:, 1] = np.where(first_to_move, opponent_count, player_count)
+        winner = np.where(cnts[:, 0] > cnts[:, 1], 0, np.where(cnts[:, 0] < cnts[:, 1], 1, 2)).astype(np.int8)
+        return cnts, winner
+
+    def moves(self, i):
+        # move list of game i, -1 for passes
+        return self.history[i, :self.n_plies[i]].tolist()
+
+if __name__ == '__main__':
+    from players.player import RandomPlayer
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    players = [RandomPlayer("random player a"), RandomPlayer("random player b")]
+    start = time.time()
+    cnts, winner = VectorGame(players, n).play()
+    end = time.time()
+    print('{} wins {}/{} games!'.format(players[0].name, np.count_nonzero(winner == 0), n))
+    print('{} wins {}/{} games!'.format(players[1].name, np.count_nonzero(winner == 1), n))
+    print('Draw {}/{} games!'.format(np.count_nonzero(winner == 2), n))
+    print(f"Time: {end - start:.6f} seconds, {n / (end - start):.2f} games/s")
@@ -0,0 +1,99 @@
+import numpy as np
+
+from clib import as_bitboards
+
+'''
+    Zobrist hashing of boards: key(board) = XOR of PLAYER_KEYS[sq] over player squares and OPPONENT_KEYS[sq] over
+    opponent squares. Keys come from a fixed seed so they are stable across processes and runs (safe for on-disk
+    caches and datasets).
+    Boards are stored side-to-move relative and edax swaps player/opponent on every move, so the incremental update
+    carries a pair (key, swapped key) where swapped key = key of (opponent, player). A move then XORs in only the placed
+    and flipped squares (see update) and a pass just swaps the pair.
+    Squares are hashed a byte (8 squares) at a time through 8 x 256 precomputed XOR tables: 8 lookups per bitboard.
+'''
+
+ZOBRIST_SEED = 0x0E7A0
+
+def _key_tables():
+    rng = np.random.default_rng(ZOBRIST_SEED)
+    keys = rng.integers(0, 2**64, size=(2, 64), dtype=np.uint64, endpoint=False)
+    # tables[side][byte_index][byte_value] = XOR of the keys of the squares set in byte_value
+    tables = np.zeros((2, 8, 256), dtype=np.uint64)
+    for bit in range(8):
+        has_bit = (np.arange(256) >> bit) & 1 == 1
+        for byte_index in range(8):
+            tables[:, byte_index, has_bit] ^= keys[:, byte_index * 8 + bit, None]
+    return keys, tables
+
+SQUARE_KEYS, BYTE_TABLES = _key_tables()
+PLAYER_KEYS, OPPONENT_KEYS = SQUARE_KEYS
+# same tables as python ints for the scalar path
+_PLAYER_TABLE, _OPPONENT_TABLE = [[[int(k) for k in row] for row in side] for side in BYTE_TABLES]
+_PLAYER_SQUARE = [int(k) for k in PLAYER_KEYS]
+_OPPONENT_SQUARE = [int(k) for k in OPPONENT_KEYS]
+# flipping a square moves it from one side to the other
+_FLIP_TABLE = [[p ^ o for p, o in zip(p_row, o_row)] for p_row, o_row in zip(_PLAYER_TABLE, _OPPONENT_TABLE)]
+
+def _xor_bytes(table, b):
+    key = 0
+    i = 0
+    while b:
+        key ^= table[i][b & 0xFF]
+        b >>= 8
+        i += 1
+    return key
+
+def key(board):
+    # zobrist key of a Board / Position
+    return _xor_bytes(_PLAYER_TABLE, board.player) ^ _xor_bytes(_OPPONENT_TABLE, board.opponent)
+
+def key_pair(board):
+    # (key, swapped key), the state carried by update/pass_move
+    p_player = _xor_bytes(_PLAYER_TABLE, board.player)
+    p_opponent = _xor_bytes(_PLAYER_TABLE, board.opponent)
+    o_player = _xor_bytes(_OPPONENT_TABLE, board.player)
+    o_opponent = _xor_bytes(_OPPONENT_TABLE, board.opponent)
+    return p_player ^ o_opponent, p_opponent ^ o_player
+
+def update(pair, move, flipped):
+    """
+        Key pair of the board after a move, from the pair before it.
+        :param pair: (key, swapped key) of the board before the move
+        :param move: square played, -1 for a pass
+        :param flipped: flipped squares bitboard, as returned by LibC.board_update
+        :return: (key, swapped key) of the board after the move (players swapped, like board_update)
+    """
+    key, swapped = pair
+    if move < 0:
+        return swapped, key
+    f = _xor_bytes(_FLIP_TABLE, flipped)
+    return swapped ^ f ^ _OPPONENT_SQUARE[move], key ^ f ^ _PLAYER_SQUARE[move]
+
+def pass_move(pair):
+    # same as board_swap_players
+    return pair[1], pair[0]
+
+def board_update(libc, board, move, next, pair):
+    """
+        LibC.board_update (or board_swap_players for move -1) plus the incremental key update.
+        :return: key pair of next
+    """
+    if move < 0:
+        if next is not board:
+            next.player, next.opponent = board.player, board.opponent
+        libc.board_swap_players(next)
+        return pass_move(pair)
+    return update(pair, move, libc.board_update(board, move, next))
+
+def _xor_table(tables, b):
+    # vectorized _xor_bytes: (n,) uint64 -> (n,) uint64
+    b = np.ascontiguousarray(b, dtype="<u8")
+    byte_values = b.view(np.uint8).reshape(-1, 8)
+    return np.bitwise_xor.reduce(tables[np.arange(8), byte_values], axis=1)
+
+def keys(player, opponent):
+    # vectorized key over uint64 arrays (or a BoardArray's player/opponent)
+    player, opponent = as_bitboards(player), as_bitboards(opponent)
+    if len(player) == 0:
+        return np.empty(0, dtype=np.uint64)
+    return _xor_table(BYTE_TABLES[0], player) ^ _xor_table(BYTE_TABLES[1], opponent)